@@ -0,0 +1,147 @@
+import json
+import os
+import re
+import tempfile
+import threading
+from datetime import date
+
+import numpy as np
+
+from export import long_rows
+
+EPOCH_YEAR = 2000
+MONTH = re.compile(r'\d{4}-(0[1-9]|1[0-2])')
+
+def month_index(report_date):
+    year, month = int(report_date[:4]), int(report_date[5:7])
+    return (year - EPOCH_YEAR) * 12 + month - 1
+
+def month_label(index):
+    return f'{EPOCH_YEAR + index // 12}-{index % 12 + 1:02d}'
+
+class Aggregates:
+    # Monthly sums and counts per (city, region, type, rooms, metric) series,
+    # one row per series and one column per month in two NumPy arrays. Every
+    # ingested snapshot adds into its month, so a trend query reads a handful
+    # of cells instead of rescanning stored history.
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.keys = {}
+        self.ingested = set()
+        self.sums = np.zeros((0, 0), dtype='float64')
+        self.counts = np.zeros((0, 0), dtype='int32')
+        self._lock = threading.Lock()
+        if directory and os.path.exists(os.path.join(directory, 'aggregates.npz')):
+            self.load()
+
+    def _grow(self, rows, months):
+        # Amortised doubling so ingesting one page never copies the whole array
+        current_rows, current_months = self.sums.shape
+        if rows <= current_rows and months <= current_months:
+            return
+        shape = (max(rows, current_rows * 2 if rows > current_rows else current_rows),
+                 max(months, current_months + 12 if months > current_months else current_months))
+        sums = np.zeros(shape, dtype='float64')
+        counts = np.zeros(shape, dtype='int32')
+        sums[:current_rows, :current_months] = self.sums
+        counts[:current_rows, :current_months] = self.counts
+        self.sums, self.counts = sums, counts
+
+    def ingest(self, df, city=None, report_date=None, type=None):
+        # Snapshots are counted once: re-ingesting the same (city, date, type) is a no-op
+        rows = list(long_rows(df, city))
+        if not rows:
+            return 0
+        report_date = report_date or rows[0][1] or date.today().isoformat()
+        type = type or rows[0][2]
+        snapshot = (rows[0][0], report_date, type)
+        with self._lock:
+            if snapshot in self.ingested:
+                return 0
+            month = month_index(report_date)
+            # A negative column would wrap around to the latest months
+            if month < 0:
+                raise ValueError(f'{report_date} is before {EPOCH_YEAR}, the first month the rollups hold')
+            indexes = []
+            for row_city, _, row_type, region, rooms, metric, value in rows:
+                key = (row_city, region, row_type or type, rooms, metric)
+                index = self.keys.get(key)
+                if index is None:
+                    index = self.keys[key] = len(self.keys)
+                indexes.append(index)
+            self._grow(len(self.keys), month + 1)
+            indexes = np.asarray(indexes)
+            np.add.at(self.sums, (indexes, month), np.array([row[6] for row in rows]))
+            np.add.at(self.counts, (indexes, month), 1)
+            self.ingested.add(snapshot)
+        return len(rows)
+
+    def _means(self, key):
+        index = self.keys.get(key)
+        if index is None:
+            return None
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.sums[index] / self.counts[index]
+
+    def _latest_month(self, means):
+        filled = np.flatnonzero(~np.isnan(means))
+        return int(filled[-1]) if len(filled) else None
+
+    def series(self, city, region, type, rooms, metric='price_sqm'):
+        means = self._means((city, region, type, rooms, metric))
+        if means is None:
+            return []
+        return [(month_label(m), float(means[m])) for m in np.flatnonzero(~np.isnan(means))]
+
+    def trend(self, city, region, type, rooms, metric='price_sqm', month=None, window=3):
+        means = self._means((city, region, type, rooms, metric))
+        if means is None:
+            return None
+        m = self._latest_month(means) if month is None else month_index(month)
+        if m is None or not 0 <= m < len(means) or np.isnan(means[m]):
+            return None
+        recent = means[max(0, m - window + 1):m + 1]
+
+        def change(offset):
+            if m - offset < 0 or np.isnan(means[m - offset]) or means[m - offset] == 0:
+                return None
+            return float((means[m] / means[m - offset] - 1) * 100)
+
+        return {
+            'month': month_label(m),
+            'mean': float(means[m]),
+            'rolling_mean': float(np.nanmean(recent)),
+            'window': window,
+            'mom_pct': change(1),
+            'yoy_pct': change(12),
+        }
+
+    def rental_yield(self, city, region, rooms, month=None):
+        # Gross yield: a year of rent per sqm over the sale price per sqm
+        sales = self._means((city, region, 'sales', rooms, 'price_sqm'))
+        rent = self._means((city, region, 'rent', rooms, 'price_sqm'))
+        if sales is None or rent is None:
+            return None
+        m = self._latest_month(sales) if month is None else month_index(month)
+        if m is None or not 0 <= m < min(len(sales), len(rent)) or np.isnan(sales[m]) or np.isnan(rent[m]) or sales[m] == 0:
+            return None
+        return {'month': month_label(m), 'yield_pct': float(rent[m] * 12 / sales[m] * 100)}
+
+    def save(self):
+        # Arrays and keys go into one file, replaced atomically
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            rows = len(self.keys)
+            meta = {'keys': [list(key) for key in sorted(self.keys, key=self.keys.get)],
+                    'ingested': sorted(list(s) for s in self.ingested)}
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, sums=self.sums[:rows], counts=self.counts[:rows], meta=np.array(json.dumps(meta, ensure_ascii=False)))
+            os.replace(tmp_path, os.path.join(self.directory, 'aggregates.npz'))
+
+    def load(self):
+        with np.load(os.path.join(self.directory, 'aggregates.npz')) as arrays:
+            self.sums, self.counts = arrays['sums'], arrays['counts']
+            meta = json.loads(str(arrays['meta']))
+        self.keys = {tuple(key): i for i, key in enumerate(meta['keys'])}
+        self.ingested = {tuple(s) for s in meta['ingested']}
@@ -1,114 +1,99 @@
 
-from flask import Flask, request, render_template
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
-import numpy as np
-import subprocess
-import re
-from datetime import datetime
+from flask import Flask, Response, request, render_template, jsonify, send_file, url_for
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import metrics
+import transport
+from export import LONG_COLUMNS
+from http_cache import ResponseCache
+from jobs import JobQueue
+from pipeline import Pipeline, extract_date_from_url, open_in_excel
+from price_index import FILTERS, PriceIndex
+from ratelimit import INTERACTIVE, Scheduler, lane
+from result_cache import ResultCache
 
 app = Flask(__name__)
 
-def extract_date_from_url(url):
-    match = re.search(r'&date=(\d{2}\.\d{2}\.\d{4})', url)
-    if match:
-        date_str = match.group(1)
-        return datetime.strptime(date_str, '%d.%m.%Y').strftime('%Y-%m-%d')
-    else:
-        return None
-
-def fetch_and_parse_table(url, table_id):
-    response = requests.get(url)
-    response.raise_for_status()
-    soup = BeautifulSoup(response.content, 'html.parser')
-    table = soup.find('table', id=table_id)
-    if table:
-        df = pd.read_html(str(table), header=0, encoding='utf-8')[0]
-        return df
-    else:
-        return None
-
-def post_process_dataframe(df, report_date):
-    df = df.copy()
-    note_indicator = '*Забележка:'
-    df = df[~df[df.columns[0]].astype(str).str.contains(note_indicator, regex=False)]
-    df.drop(index=[3], inplace=True)
-    df.drop(columns=df.columns[[1, 4, 7, 10]], inplace=True)
-    df.columns = ['Region', '1_Room_Price', '1_Room_Price_Sqm', '2_Room_Price', '2_Room_Price_Sqm',
-                  '3_Room_Price', '3_Room_Price_Sqm', 'Avg_Price_Sqm']
-    for col in df.columns[1:]:
-        df[col] = df[col].str.replace(' ', '').replace('-', np.nan)
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-    df.dropna(how='all', inplace=True)
-    df['report_date'] = report_date
-    return df
-
-def open_in_excel(file_name):
-    subprocess.run(["open", "-a", "Microsoft Excel", file_name])
-    script = '''
-        tell application "Microsoft Excel"
-            activate
-        end tell
-    '''
-    subprocess.run(["osascript", "-e", script])
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+if os.environ.get('IMOT_CACHE_DIR'):
+    cache_mb = int(os.environ.get('IMOT_CACHE_MB', '512'))
+    transport.set_cache(ResponseCache(os.environ['IMOT_CACHE_DIR'], cache_mb * 1024 * 1024))
+
+# /submit fetches go in the interactive lane. Point IMOT_RATE_FILE at the same
+# file as the CLI/daemon's --rate-file to share one request budget with their
+# backfills and get ahead of them
+transport.set_scheduler(Scheduler(
+    rate=float(os.environ.get('IMOT_RATE', '4')),
+    max_concurrency=int(os.environ.get('IMOT_MAX_CONCURRENCY', '8')),
+    shared_path=os.environ.get('IMOT_RATE_FILE'),
+))
+
+result_cache = ResultCache(
+    max_bytes=int(os.environ.get('IMOT_RESULT_CACHE_MB', '256')) * 1024 * 1024,
+    ttl=int(os.environ.get('IMOT_RESULT_TTL', '900')),
+    directory=os.environ.get('IMOT_RESULT_CACHE_DIR'),
+    max_disk_bytes=int(os.environ.get('IMOT_RESULT_CACHE_DISK_MB', '1024')) * 1024 * 1024,
+)
+job_queue = JobQueue(max_workers=int(os.environ.get('IMOT_JOB_WORKERS', '4')))
+pipeline = Pipeline()
+price_index = PriceIndex(os.environ['IMOT_INDEX']) if os.environ.get('IMOT_INDEX') else None
+API_LIMIT = 100000
+aggregates_dir = os.environ.get('IMOT_AGGREGATES')
+aggregates = {'mtime': None, 'rollups': None}
+
+# Encoded API bodies by ETag; an ETag changes whenever the index is written to
+api_responses = OrderedDict()
+api_responses_lock = threading.Lock()
+
+metrics.registry.register('imot_result_cache_hits_total', lambda: result_cache.stats()['hits'], 'counter', 'Processed results served from the result cache.')
+metrics.registry.register('imot_result_cache_misses_total', lambda: result_cache.stats()['misses'], 'counter', 'Result cache lookups that had to build the report.')
+metrics.registry.register('imot_result_cache_bytes', lambda: result_cache.stats()['bytes'], 'gauge', 'Approximate size of the in-memory result cache.')
+
+def build_report(url):
+    processed_df = pipeline.process(url)
+    if processed_df is None:
+        raise ValueError(f"Table with id='tableStats' not found at {url}")
+    if processed_df.attrs['coerce_failures']:
+        app.logger.warning('%d price cells could not be converted for %s', processed_df.attrs['coerce_failures'], url)
+
+    # Build the workbook in memory so the web path never touches the disk
+    buffer = BytesIO()
+    pipeline.export(processed_df, buffer)
+    return processed_df, buffer.getvalue()
 
 def process_data(url, output, excel):
+    with metrics.timer('request'), lane(INTERACTIVE):
+        return _process_data(url, output, excel)
+
+def _process_data(url, output, excel):
+    cached = result_cache.get(url)
+    if cached is None:
+        processed_df, content = build_report(url)
+        size = len(content) + int(processed_df.memory_usage(deep=True).sum())
+        result_cache.put(url, (processed_df, content), size)
+    else:
+        processed_df, content = cached
+
     report_date = extract_date_from_url(url)
-    table_df = fetch_and_parse_table(url, 'tableStats')
-    if table_df is not None:
-        # Post-process DataFrame
-        processed_df = post_process_dataframe(table_df, report_date)
-
-        # Remove rows where 'Region' column is 'Район' or null/empty
-        processed_df = processed_df[processed_df['Region'].notna()]
-        processed_df = processed_df[~processed_df['Region'].str.strip().str.lower().eq('район')]
-
-        # Continue with creating the Excel file
-        if report_date:
-            output_file_name = f"{report_date} - {output}.xlsx"
-        else:
-            output_file_name = f"{output}.xlsx"
-
-        writer = pd.ExcelWriter(output_file_name, engine='xlsxwriter')
-        processed_df.to_excel(writer, sheet_name='Sheet1', index=False)
-
-        workbook = writer.book
-        worksheet = writer.sheets['Sheet1']
-
-        # Define header format
-        header_format = workbook.add_format({
-            'bold': True,
-            'text_wrap': True,
-            'valign': 'top',
-            'fg_color': '#007ddf',  # blue
-            'font_color': '#FFFFFF',  # white
-            'border': 1
-        })
-
-        # Define the Euro accounting format
-        euro_format = workbook.add_format({'num_format': '€ #,##0.00', 'align': 'right'})
-
-        # Apply the Euro accounting format to the price columns
-        price_columns = ['1_Room_Price', '1_Room_Price_Sqm', '2_Room_Price', '2_Room_Price_Sqm', '3_Room_Price', '3_Room_Price_Sqm', 'Avg_Price_Sqm']
-        for column in price_columns:
-            col_idx = processed_df.columns.get_loc(column)
-            worksheet.set_column(col_idx, col_idx, 18, euro_format)  # Adjust the column width as needed
-
-        # Apply the header format to the header row
-        for col_num, value in enumerate(processed_df.columns):
-            worksheet.write(0, col_num, value, header_format)
-
-        # Apply the table format to the entire range of the DataFrame
-        last_row = len(processed_df.index)
-        last_col = len(processed_df.columns) - 1
-        column_settings = [{'header': column_name, 'header_format': header_format} for column_name in processed_df.columns]
-        worksheet.add_table(0, 0, last_row, last_col, {'columns': column_settings, 'style': 'Table Style Medium 9'})
-
-        writer.close()
-
-        if excel:
-            open_in_excel(output_file_name)
+    if report_date:
+        output_file_name = f"{report_date} - {output}.xlsx"
+    else:
+        output_file_name = f"{output}.xlsx"
+
+    # Opening in Excel only makes sense when the app runs on the analyst's own machine
+    if excel:
+        with open(output_file_name, 'wb') as f:
+            f.write(content)
+        open_in_excel(output_file_name)
+
+    return output_file_name, content
 
 
 @app.route('/')
@@ -120,8 +105,115 @@ def submit():
     url = request.form['url']
     output = request.form['output']
     excel = 'excel' in request.form
-    process_data(url, output, excel)
-    return 'Data processed successfully!'
+    job_id = job_queue.submit(process_data, url, output, excel)
+    return jsonify({
+        'job_id': job_id,
+        'status_url': url_for('job_status', job_id=job_id),
+        'result_url': url_for('job_result', job_id=job_id),
+    }), 202
+
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+def api_response(etag, build):
+    if etag in request.if_none_match:
+        return Response(status=304, headers={'ETag': f'"{etag}"'})
+    with api_responses_lock:
+        cached = api_responses.get(etag)
+    if cached is None:
+        body = json.dumps(build(), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        cached = (body, gzip.compress(body, compresslevel=5) if len(body) > 1024 else None)
+        with api_responses_lock:
+            api_responses[etag] = cached
+            while len(api_responses) > 256:
+                api_responses.popitem(last=False)
+    body, compressed = cached
+    response = Response(body, mimetype='application/json')
+    if compressed is not None and 'gzip' in request.accept_encodings:
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers['ETag'] = f'"{etag}"'
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/prices')
+def api_prices():
+    if price_index is None:
+        return jsonify({'error': 'No price index configured, set IMOT_INDEX'}), 503
+    filters = {name: request.args.get(name) for name in FILTERS if request.args.get(name)}
+    limit = max(1, min(request.args.get('limit', API_LIMIT, type=int), API_LIMIT))
+    key = json.dumps([price_index.version(), sorted(filters.items()), limit])
+    etag = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+    def build():
+        rows = price_index.query(limit=limit, **filters)
+        return {'count': len(rows), 'rows': [dict(zip(LONG_COLUMNS, row)) for row in rows]}
+
+    return api_response(etag, build)
+
+def current_aggregates():
+    # Reload the rollups only when the CLI has saved a newer file
+    from aggregates import Aggregates
+
+    mtime = os.path.getmtime(os.path.join(aggregates_dir, 'aggregates.npz'))
+    if mtime != aggregates['mtime']:
+        aggregates['rollups'] = Aggregates(aggregates_dir)
+        aggregates['mtime'] = mtime
+    return aggregates['rollups'], mtime
+
+@app.route('/api/trends')
+def api_trends():
+    from aggregates import MONTH
+
+    if not aggregates_dir or not os.path.exists(os.path.join(aggregates_dir, 'aggregates.npz')):
+        return jsonify({'error': 'No aggregates configured, set IMOT_AGGREGATES'}), 503
+    city, region = request.args.get('city'), request.args.get('region')
+    if not city or not region:
+        return jsonify({'error': 'city and region are required'}), 400
+    rooms = request.args.get('rooms', 'all')
+    type = request.args.get('type', 'sales')
+    metric = request.args.get('metric', 'price_sqm')
+    month = request.args.get('month')
+    window = request.args.get('window', 3, type=int)
+    if month and not MONTH.fullmatch(month):
+        return jsonify({'error': 'month must be YYYY-MM'}), 400
+    if window < 1:
+        return jsonify({'error': 'window must be at least 1'}), 400
+    rollups, mtime = current_aggregates()
+    key = json.dumps([mtime, city, region, rooms, type, metric, month, window, 'series' in request.args], ensure_ascii=False)
+    etag = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+    def build():
+        return {
+            'trend': rollups.trend(city, region, type, rooms, metric, month, window),
+            'yield': rollups.rental_yield(city, region, rooms, month),
+            'series': rollups.series(city, region, type, rooms, metric) if 'series' in request.args else None,
+        }
+
+    return api_response(etag, build)
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    status = job_queue.status(job_id)
+    if status is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    if job['status'] != 'finished':
+        return jsonify(job_queue.status(job_id)), 409
+    file_name, content = job['result']
+    return send_file(BytesIO(content), mimetype=XLSX_MIMETYPE, as_attachment=True, download_name=file_name)
 
 if __name__ == '__main__':
     app.run(debug=True)
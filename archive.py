@@ -0,0 +1,95 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+def _zstandard():
+    # Imported on first use, the CLI creates no archive on --help or up-to-date runs
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+class PageArchive:
+    # Raw pages stored once per distinct body under blobs/<sha256>, compressed
+    # with zstd when available and gzip otherwise. index.ndjson records every
+    # fetch as (url, city, fetched_at, sha256), so the same URL can be replayed
+    # as of its latest fetch without touching the network.
+    def __init__(self, directory):
+        self.directory = directory
+        self.index_path = os.path.join(directory, 'index.ndjson')
+        self._lock = threading.Lock()
+        self._latest = None
+        os.makedirs(os.path.join(directory, 'blobs'), exist_ok=True)
+
+    def _blob_path(self, sha, codec):
+        return os.path.join(self.directory, 'blobs', sha[:2], f'{sha}.{codec}')
+
+    def put(self, url, content, city=None):
+        sha = hashlib.sha256(content).hexdigest()
+        zstandard = _zstandard()
+        codec = 'zst' if zstandard is not None else 'gz'
+        path = self._blob_path(sha, codec)
+        if not os.path.exists(path):
+            if codec == 'zst':
+                data = zstandard.ZstdCompressor(level=10).compress(content)
+            else:
+                data = gzip.compress(content, compresslevel=6)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        entry = {'url': url, 'city': city, 'fetched_at': time.time(), 'sha256': sha, 'codec': codec}
+        with self._lock:
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            if self._latest is not None:
+                self._latest[url] = entry
+        return sha
+
+    def latest(self):
+        with self._lock:
+            if self._latest is None:
+                latest = {}
+                if os.path.exists(self.index_path):
+                    with open(self.index_path, encoding='utf-8') as f:
+                        for line in f:
+                            try:
+                                entry = json.loads(line)
+                            except ValueError:
+                                continue
+                            previous = latest.get(entry['url'])
+                            if previous is None or entry['fetched_at'] >= previous['fetched_at']:
+                                latest[entry['url']] = entry
+                self._latest = latest
+            return self._latest
+
+    def read(self, sha, codec):
+        with open(self._blob_path(sha, codec), 'rb') as f:
+            data = f.read()
+        if codec == 'zst':
+            zstandard = _zstandard()
+            if zstandard is None:
+                raise RuntimeError('This archive entry is zstd-compressed, install zstandard to read it.')
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    def fetch(self, url):
+        entry = self.latest().get(url)
+        if entry is None:
+            raise LookupError(f"{url} is not in the archive")
+        return self.read(entry['sha256'], entry['codec'])
+
+    def base_entries(self):
+        # (city, base_url) for every archived page, with the &pn= suffix removed
+        seen = {}
+        for url, entry in self.latest().items():
+            base_url = re.sub(r'&pn=\d+$', '', url)
+            seen.setdefault(base_url, entry.get('city'))
+        return sorted(((city, base_url) for base_url, city in seen.items()), key=lambda e: (e[0] or '', e[1]))
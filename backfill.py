@@ -0,0 +1,35 @@
+import json
+import os
+import threading
+
+class CompletionLog:
+    # Append-only record of stored (city, report_date, type) snapshots. Each
+    # success is one fsynced line, so an interrupted backfill loses at most
+    # the line being written and resumes from everything before it.
+    def __init__(self, path):
+        self.path = path
+        self.completed = set()
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        city, report_date, type = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.completed.add((city, report_date, type))
+
+    def is_done(self, city, report_date, type):
+        return (city, report_date, type) in self.completed
+
+    def mark(self, city, report_date, type):
+        if self.is_done(city, report_date, type):
+            return
+        line = json.dumps([city, report_date, type], ensure_ascii=False) + '\n'
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self.completed.add((city, report_date, type))
@@ -0,0 +1,45 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import synthetic_page
+from pipeline import Pipeline, frame_from_columns, process_chunk
+
+parser = argparse.ArgumentParser(description='Measure the process-pool parse+clean stage against parsing in one process.')
+parser.add_argument('--pages', type=int, default=400, help='Synthetic pages to parse.')
+parser.add_argument('-w', '--workers', type=int, nargs='+', default=[2, 4, os.cpu_count() or 1], help='Worker counts to try.')
+parser.add_argument('--chunk-size', type=int, default=8, help='Pages handed to a worker at a time.')
+
+def chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    pipeline = Pipeline(label='Bed')
+    distinct = [synthetic_page(seed, listing='rent' if seed % 2 else 'sales') for seed in range(16)]
+    items = [(distinct[i % len(distinct)], f'http://stub/stats?date=01.01.2020&pn={i % 2}', 'sales') for i in range(args.pages)]
+
+    process_chunk(pipeline, items[:1])
+    start = time.perf_counter()
+    for chunk in chunks(items, args.chunk_size):
+        for columns in process_chunk(pipeline, chunk)[0]:
+            frame_from_columns(columns)
+    serial = time.perf_counter() - start
+    print(f"1 process: {args.pages / serial:.0f} pages/s")
+
+    for workers in sorted(set(args.workers)):
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Warm the workers up so process start-up is not measured
+            list(pool.map(process_chunk, [pipeline] * workers, [items[:1]] * workers))
+            start = time.perf_counter()
+            for results, _ in pool.map(process_chunk, repeat(pipeline), chunks(items, args.chunk_size)):
+                for columns in results:
+                    frame_from_columns(columns)
+            elapsed = time.perf_counter() - start
+        print(f"{workers} processes: {args.pages / elapsed:.0f} pages/s, {serial / elapsed:.1f}x")
@@ -0,0 +1,34 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from fixtures import synthetic_page
+from table_parser import parse_table, parse_table_bs4
+
+parser = argparse.ArgumentParser(description='Compare the streaming table parser against BeautifulSoup + read_html.')
+parser.add_argument('pages', nargs='*', help='Saved statistics pages; synthetic pages are used when omitted.')
+parser.add_argument('-n', '--repeat', type=int, default=20, help='Parses per page and parser.')
+args = parser.parse_args()
+
+def timed(func, content, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        df = func(content, 'tableStats')
+    return (time.perf_counter() - start) / repeat, df
+
+if __name__ == "__main__":
+    if args.pages:
+        pages = [(path, open(path, 'rb').read()) for path in args.pages]
+    else:
+        pages = [('synthetic sales', synthetic_page(1)), ('synthetic rent', synthetic_page(2, listing='rent'))]
+
+    for name, content in pages:
+        fast, fast_df = timed(parse_table, content, args.repeat)
+        slow, slow_df = timed(parse_table_bs4, content, args.repeat)
+        pd.testing.assert_frame_equal(fast_df, slow_df)
+        print(f"{name}: {len(content) / 1024:.0f} KiB, fast {fast * 1000:.2f} ms, bs4 {slow * 1000:.2f} ms, {slow / fast:.1f}x")
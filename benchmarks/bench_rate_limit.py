@@ -0,0 +1,72 @@
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+import transport
+from ratelimit import INTERACTIVE, Scheduler, lane
+from stub_server import StubServer
+
+parser = argparse.ArgumentParser(description='Fetch from a stub that throttles above a concurrency limit, with and without the scheduler.')
+parser.add_argument('-n', '--requests', type=int, default=200)
+parser.add_argument('--threads', type=int, default=16, help='Fetch threads, deliberately more than the stub accepts.')
+parser.add_argument('--max-inflight', type=int, default=4, help='The stub answers 429 above this many concurrent requests.')
+parser.add_argument('--latency', type=float, default=0.05)
+parser.add_argument('--rate', type=float, default=40.0, help='Scheduler requests per second.')
+parser.add_argument('--interactive', type=int, default=10, help='Interactive requests issued while the background batch runs.')
+
+def run(server, scheduler, args):
+    transport.configure(retries=8, backoff=0.1, backoff_max=2.0)
+    transport.set_scheduler(scheduler)
+    failures = []
+    interactive = []
+
+    def fetch(i):
+        try:
+            transport.fetch(f'{server.url}/stats?date=01.01.2024&pn={i % 2}&i={i}')
+        except requests.RequestException:
+            failures.append(i)
+
+    def fetch_interactive(i):
+        start = time.perf_counter()
+        with lane(INTERACTIVE):
+            fetch(-i)
+        interactive.append(time.perf_counter() - start)
+
+    throttled = server.throttled
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        background = [pool.submit(fetch, i) for i in range(args.requests)]
+        time.sleep(0.5)
+        extra = [threading.Thread(target=fetch_interactive, args=(i,)) for i in range(1, args.interactive + 1)]
+        for thread in extra:
+            thread.start()
+        for thread in extra:
+            thread.join()
+        for future in background:
+            future.result()
+    elapsed = time.perf_counter() - start
+    return {
+        'pages_per_s': (args.requests + args.interactive - len(failures)) / elapsed,
+        'throttled': server.throttled - throttled,
+        'failed': len(failures),
+        'interactive_ms': sorted(interactive)[len(interactive) // 2] * 1000 if interactive else None,
+        'hosts': scheduler.stats() if scheduler else None,
+    }
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    with StubServer(latency=args.latency, max_inflight=args.max_inflight) as server:
+        for name, scheduler in [('no scheduler', None), ('scheduler', Scheduler(rate=args.rate, max_concurrency=args.threads))]:
+            result = run(server, scheduler, args)
+            print(f"{name}: {result['pages_per_s']:.1f} pages/s, {result['throttled']} 429s, {result['failed']} failed, "
+                  f"interactive p50 {result['interactive_ms']:.0f} ms")
+            if result['hosts']:
+                for host, stats in result['hosts'].items():
+                    print(f"  {host}: {stats}")
@@ -0,0 +1,181 @@
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fixtures import synthetic_page
+
+TYPES = ['sales', 'rent']
+BENCHMARKS = ['extract_date', 'parse', 'post_process', 'fetch_parse', 'xlsx_pandas', 'xlsx_sink']
+
+parser = argparse.ArgumentParser(description='Run the benchmark suite and save throughput, latency percentiles and peak RSS as JSON.')
+parser.add_argument('pages', nargs='*', help='Saved statistics pages (sales first, then rent); synthetic pages are used when omitted.')
+parser.add_argument('--only', nargs='+', choices=BENCHMARKS, default=BENCHMARKS)
+parser.add_argument('-n', '--ops', type=int, default=200, help='Pages per benchmark (extract_date runs 100x as many calls).')
+parser.add_argument('--workers', type=int, default=8, help='Concurrent fetches in fetch_parse.')
+parser.add_argument('--latency', type=float, default=0.02, help='Stub server latency in seconds for fetch_parse.')
+parser.add_argument('--jitter', type=float, default=0.01, help='Extra random stub server latency in seconds.')
+parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of stub responses answered with 503.')
+parser.add_argument('-o', '--output', help='JSON file for the results, defaults to bench-<timestamp>.json.')
+parser.add_argument('--compare', help='Earlier results file to print ratios against.')
+parser.add_argument('--run', choices=BENCHMARKS, help=argparse.SUPPRESS)
+
+def load_pages(paths):
+    if paths:
+        contents = [open(path, 'rb').read() for path in paths]
+        return list(zip(contents, ['sales', 'rent'] * len(contents)))
+    return [(synthetic_page(1), 'sales'), (synthetic_page(2, listing='rent'), 'rent')]
+
+def percentile(latencies, q):
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+def measure(op, count):
+    # One untimed call first, so lazy imports do not land in the percentiles
+    op(0)
+    latencies = []
+    start = time.perf_counter()
+    for i in range(count):
+        t = time.perf_counter()
+        op(i)
+        latencies.append(time.perf_counter() - t)
+    return time.perf_counter() - start, latencies
+
+def bench_extract_date(args, pages):
+    from pipeline import extract_date_from_url
+
+    urls = [f'https://www.imot.bg/pcgi/imot.cgi?act=14&city=sofia&date={d % 28 + 1:02d}.01.2024&pn={d % 2}' for d in range(100)]
+    return 'urls', measure(lambda i: extract_date_from_url(urls[i % len(urls)]), args.ops * 100)
+
+def bench_parse(args, pages):
+    from pipeline import parse_page
+
+    return 'pages', measure(lambda i: parse_page(pages[i % len(pages)][0]), args.ops)
+
+def bench_post_process(args, pages):
+    from pipeline import parse_page, post_process_dataframe
+
+    frames = [parse_page(content) for content, _ in pages]
+    return 'pages', measure(lambda i: post_process_dataframe(frames[i % len(frames)], '2024-01-01', 'Bed'), args.ops)
+
+def bench_fetch_parse(args, pages):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from pipeline import Pipeline
+    from stub_server import StubServer
+
+    pipeline = Pipeline(label='Bed')
+    latencies = []
+
+    def fetch(i):
+        t = time.perf_counter()
+        pipeline.process(f'{server.url}/pcgi/imot.cgi?act=14&date={i // 2 % 28 + 1:02d}.01.2024&pn={i % 2}', TYPES[i % 2])
+        latencies.append(time.perf_counter() - t)
+
+    with StubServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate) as server:
+        pipeline.process_content(pages[0][0], '', 'sales')
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            list(pool.map(fetch, range(args.ops)))
+        return 'pages', (time.perf_counter() - start, latencies)
+
+def page_frames(pages):
+    import pandas as pd
+
+    from pipeline import Pipeline
+
+    pipeline = Pipeline(label='Bed')
+    frames = [pipeline.process_content(content, '&date=01.01.2024', type) for content, type in pages]
+    return pd.concat(frames, ignore_index=True)
+
+def bench_xlsx_pandas(args, pages):
+    from pipeline import write_workbook
+
+    df = page_frames(pages)
+    return 'pages', measure(lambda i: write_workbook(df, io.BytesIO()), args.ops // len(pages) or 1)
+
+def bench_xlsx_sink(args, pages):
+    from export import XlsxSink
+
+    df = page_frames(pages)
+    with tempfile.TemporaryDirectory() as tmp:
+        sink = XlsxSink(os.path.join(tmp, 'bench.xlsx'))
+        seconds, latencies = measure(lambda i: sink.write(df), args.ops // len(pages) or 1)
+        start = time.perf_counter()
+        sink.close()
+        return 'pages', (seconds + time.perf_counter() - start, latencies)
+
+def run(name, args):
+    pages = load_pages(args.pages)
+    unit, (seconds, latencies) = globals()[f'bench_{name}'](args, pages)
+    # Both Excel benchmarks write one sales and one rent page per operation
+    per_op = len(pages) if name.startswith('xlsx') else 1
+    return {
+        'name': name,
+        'unit': unit,
+        'count': len(latencies) * per_op,
+        'seconds': seconds,
+        'per_second': len(latencies) * per_op / seconds,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    if args.run:
+        print(json.dumps(run(args.run, args)))
+        sys.exit(0)
+
+    # Each benchmark runs in its own process so peak RSS is not shared between them
+    options = [str(a) for a in args.pages] + ['-n', str(args.ops), '--workers', str(args.workers), '--latency', str(args.latency),
+                                              '--jitter', str(args.jitter), '--error-rate', str(args.error_rate)]
+    results = []
+    for name in args.only:
+        out = subprocess.run([sys.executable, __file__, '--run', name] + options, capture_output=True, text=True)
+        if out.returncode:
+            print(f'{name}: failed\n{out.stderr}')
+            continue
+        result = json.loads(out.stdout.splitlines()[-1])
+        results.append(result)
+        print(f"{name}: {result['per_second']:.1f} {result['unit']}/s, p50 {result['p50_ms']:.3f} ms, "
+              f"p99 {result['p99_ms']:.3f} ms, peak RSS {result['peak_rss_mb']:.0f} MiB")
+
+    report = {
+        'revision': git_revision(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'fixtures': args.pages or 'synthetic',
+        'results': results,
+    }
+    output = args.output or f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f'Results saved to {output}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            base = {r['name']: r for r in json.load(f)['results']}
+        for result in results:
+            before = base.get(result['name'])
+            if before:
+                print(f"{result['name']}: {result['per_second'] / before['per_second']:.2f}x throughput, "
+                      f"p99 {result['p99_ms'] / before['p99_ms']:.2f}x, peak RSS {result['peak_rss_mb'] / before['peak_rss_mb']:.2f}x")
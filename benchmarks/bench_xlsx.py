@@ -0,0 +1,74 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+parser = argparse.ArgumentParser(description='Compare the pandas workbook writer with the constant-memory xlsxwriter sink.')
+parser.add_argument('--rows', type=int, default=1000000, help='Rows in the synthetic export.')
+parser.add_argument('--chunk', type=int, default=60, help='Rows per page handed to the streaming sink.')
+parser.add_argument('--modes', nargs='+', default=['pandas', 'constant-memory'], choices=['pandas', 'constant-memory'])
+parser.add_argument('--run', choices=['pandas', 'constant-memory'], help=argparse.SUPPRESS)
+
+def synthetic_chunks(rows, chunk):
+    import numpy as np
+    import pandas as pd
+
+    from pipeline import price_columns
+
+    rng = np.random.default_rng(0)
+    columns = price_columns('Bed')
+    cities = ['sofia', 'varna', 'plovdiv', 'burgas']
+    for start in range(0, rows, chunk):
+        n = min(chunk, rows - start)
+        page = start // chunk
+        df = pd.DataFrame(rng.uniform(500, 250000, size=(n, len(columns))).round(0), columns=columns)
+        df.insert(0, 'Region', [f'Район {i}' for i in range(n)])
+        df['report_date'] = f'2020-01-{page % 28 + 1:02d}'
+        df['type'] = 'sales' if page % 2 == 0 else 'rent'
+        df['city'] = cities[page % len(cities)]
+        yield df
+
+def run(mode, rows, chunk, path):
+    start = time.perf_counter()
+    if mode == 'pandas':
+        import pandas as pd
+
+        from pipeline import write_workbook
+
+        write_workbook(pd.concat(synthetic_chunks(rows, chunk), ignore_index=True), path)
+    else:
+        from export import XlsxSink
+
+        sink = XlsxSink(path)
+        for df in synthetic_chunks(rows, chunk):
+            sink.write(df)
+        sink.close()
+    return {
+        'mode': mode,
+        'rows': rows,
+        'seconds': time.perf_counter() - start,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'file_mb': os.path.getsize(path) / 1024 / 1024,
+    }
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    if args.run:
+        with tempfile.TemporaryDirectory() as tmp:
+            print(json.dumps(run(args.run, args.rows, args.chunk, os.path.join(tmp, 'bench.xlsx'))))
+        sys.exit(0)
+
+    # Each writer runs in its own process so peak RSS is not shared between them
+    for mode in args.modes:
+        out = subprocess.run([sys.executable, __file__, '--run', mode, '--rows', str(args.rows), '--chunk', str(args.chunk)],
+                             capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.splitlines()[-1])
+        print(f"{mode}: {result['rows']} rows in {result['seconds']:.1f} s, "
+              f"{result['rows'] / result['seconds']:.0f} rows/s, peak RSS {result['peak_rss_mb']:.0f} MiB, file {result['file_mb']:.0f} MiB")
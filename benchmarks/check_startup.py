@@ -0,0 +1,72 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, 'scraper-1.7.py')
+
+# Modules that must never be imported before the CLI knows it has work to do
+HEAVY = ['pandas', 'numpy', 'requests', 'urllib3', 'lxml', 'bs4', 'pyarrow', 'xlsxwriter', 'zstandard']
+
+# A past report date on an unroutable port: if the fast path breaks, the run
+# shows up as slow and with heavy imports instead of hanging on the network
+URL = 'http://127.0.0.1:9/stats?act=14&date=01.01.2020'
+
+parser = argparse.ArgumentParser(description='Check scraper-1.7.py startup time and imports with -X importtime.')
+parser.add_argument('--budget-ms', type=float, default=75.0, help='Maximum wall time of a no-op invocation on top of the bare interpreter start-up.')
+parser.add_argument('-n', '--repeat', type=int, default=5, help='Runs per case; the fastest one is compared to the budget.')
+
+def imported_modules(stderr):
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        try:
+            modules[name.strip()] = int(cumulative)
+        except ValueError:
+            continue
+    return modules
+
+def run_case(argv, cwd, repeat):
+    profile = subprocess.run([sys.executable, '-X', 'importtime'] + argv,
+                             cwd=cwd, capture_output=True, text=True, timeout=60)
+    modules = imported_modules(profile.stderr)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + argv, cwd=cwd, capture_output=True, timeout=60)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, modules
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    failed = False
+    with tempfile.TemporaryDirectory() as cwd:
+        open(os.path.join(cwd, '2020-01-01 - check.xlsx'), 'wb').close()
+        # Whatever the bare interpreter imports (site, .pth hooks) is not ours
+        baseline, interpreter_modules = run_case(['-c', 'pass'], cwd, args.repeat)
+        print(f"interpreter startup: {baseline:.0f} ms")
+        cases = [
+            ('--help', [SCRIPT, '--help']),
+            ('up-to-date run', [SCRIPT, '-l', URL, '-o', 'check']),
+        ]
+        for name, argv in cases:
+            best, modules = run_case(argv, cwd, args.repeat)
+            modules = {m: us for m, us in modules.items() if m not in interpreter_modules}
+            heavy = [m for m in HEAVY if m in modules]
+            slowest = sorted(modules.items(), key=lambda item: -item[1])[:3]
+            overhead = best - baseline
+            print(f"{name}: {best:.0f} ms ({overhead:.0f} ms over the interpreter), slowest imports: " + ', '.join(f"{m} {us / 1000:.1f} ms" for m, us in slowest))
+            if heavy:
+                print(f"  FAIL: imported {', '.join(heavy)}")
+                failed = True
+            # Interpreter start-up depends on the machine, only our own share is budgeted
+            if overhead > args.budget_ms:
+                print(f"  FAIL: {overhead:.0f} ms over the interpreter, the budget is {args.budget_ms:.0f} ms")
+                failed = True
+    sys.exit(1 if failed else 0)
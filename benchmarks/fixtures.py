@@ -0,0 +1,36 @@
+import random
+
+REGION_HEADER = 'Район'
+NOTE = '*Забележка: Цените са в евро и са изчислени на база обявите в сайта.'
+
+def _money(value):
+    return f'{value:,}'.replace(',', ' ')
+
+def synthetic_page(seed=0, regions=60, padding=400, listing='sales'):
+    # A page shaped like the imot.bg statistics page: navigation and script
+    # noise around a tableStats table with spacer columns, a sub-header row,
+    # a repeated region header row and a trailing note row
+    rng = random.Random(seed)
+    scale = 1 if listing == 'sales' else 0.005
+    out = ['<!DOCTYPE html><html><head><meta charset="utf-8"><title>imot.bg</title>']
+    out += [f'<script>var s{i} = "{"x" * 80}";</script>' for i in range(padding // 10)]
+    out.append('</head><body><div id="menu"><ul>')
+    out += [f'<li><a href="/pcgi/imot.cgi?act=3&amp;slink={i}">Обяви {i}</a></li>' for i in range(padding)]
+    out.append('</ul></div><table id="tableStats" class="tbl">')
+    out.append(f'<tr><th>{REGION_HEADER}</th><th></th><th colspan="2">Едностайни</th><th></th>'
+               '<th colspan="2">Двустайни</th><th></th><th colspan="2">Тристайни</th><th></th><th>Средна</th></tr>')
+    out.append('<tr><td></td><td></td><td>Цена</td><td>Цена/кв.м</td><td></td><td>Цена</td><td>Цена/кв.м</td>'
+               '<td></td><td>Цена</td><td>Цена/кв.м</td><td></td><td>Цена/кв.м</td></tr>')
+    for i in range(regions):
+        if i == 2:
+            out.append(f'<tr><td>{REGION_HEADER}</td><td></td><td colspan="10"></td></tr>')
+        cells = [f'Район {i}', '']
+        for rooms in (1, 2, 3):
+            price = '-' if rng.random() < 0.1 else _money(int(rng.randint(30000, 90000) * rooms * scale))
+            cells += [price, _money(int(rng.randint(800, 2500) * scale * 10) or 1), '']
+        cells.append(_money(int(rng.randint(900, 2000) * scale * 10) or 1))
+        out.append('<tr>' + ''.join(f'<td>{c}</td>' for c in cells) + '</tr>')
+    out.append(f'<tr><td colspan="12">{NOTE}</td></tr></table>')
+    out += [f'<div class="footer-link"><a href="/help/{i}">Помощ {i}</a></div>' for i in range(padding)]
+    out.append('</body></html>')
+    return '\n'.join(out).encode('utf-8')
@@ -0,0 +1,134 @@
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixtures import synthetic_page
+
+parser = argparse.ArgumentParser(description='Serve synthetic tableStats pages locally with injected latency and errors.')
+parser.add_argument('--port', type=int, default=8000)
+parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response.')
+parser.add_argument('--jitter', type=float, default=0.0, help='Extra random latency, uniform between 0 and this many seconds.')
+parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 503.')
+parser.add_argument('--throttle-rate', type=float, default=0.0, help='Fraction of requests answered with 429 and Retry-After: 1.')
+parser.add_argument('--max-inflight', type=int, default=0, help='Answer 429 while more than this many requests are in flight (0 = unlimited).')
+
+class StubServer:
+    # Answers any path with a synthetic statistics page: pn=0 is the sales
+    # listing and pn=1 the rent listing, the date= parameter seeds the numbers
+    def __init__(self, port=0, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, max_inflight=0, seed=0, retry_after=1):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.max_inflight = max_inflight
+        self.retry_after = retry_after
+        self.requests = 0
+        self.throttled = 0
+        self.in_flight = 0
+        self._rng = random.Random(seed)
+        self._pages = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def page(self, date, listing):
+        key = (date, listing)
+        with self._lock:
+            if key not in self._pages:
+                self._pages[key] = synthetic_page(seed=zlib.crc32(f'{date}/{listing}'.encode()), listing=listing)
+            return self._pages[key]
+
+    def set_page(self, date, listing, body):
+        # Serve fixed bytes for one page, e.g. a changed layout or a different charset
+        with self._lock:
+            self._pages[(date, listing)] = body
+
+    def _outcome(self):
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            roll = self._rng.random()
+            overloaded = self.max_inflight and self.in_flight > self.max_inflight
+        if roll < self.error_rate:
+            return delay, 503
+        if overloaded or roll < self.error_rate + self.throttle_rate:
+            with self._lock:
+                self.throttled += 1
+            return delay, 429
+        return delay, 200
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub._lock:
+                    stub.in_flight += 1
+                try:
+                    self._respond()
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+            def _respond(self):
+                delay, status = stub._outcome()
+                if delay:
+                    time.sleep(delay)
+                if status != 200:
+                    self.send_response(status)
+                    if status == 429:
+                        self.send_header('Retry-After', f'{stub.retry_after:g}')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                query = parse_qs(urlsplit(self.path).query)
+                listing = 'rent' if query.get('pn') == ['1'] else 'sales'
+                body = stub.page(query.get('date', [''])[0], listing)
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    server = StubServer(args.port, args.latency, args.jitter, args.error_rate, args.throttle_rate, args.max_inflight)
+    print(f'Serving synthetic pages on {server.url}')
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
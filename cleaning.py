@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+NOTE_INDICATOR = '*Забележка:'
+
+# Thousands separators seen on imot.bg: plain, non-breaking and thin spaces
+_strip_spaces = str.maketrans('', '', ' \xa0\u202f\u2009')
+
+def note_rows(column):
+    return column.astype('string').str.contains(NOTE_INDICATOR, regex=False).fillna(False).to_numpy(dtype=bool)
+
+def to_float_block(frame):
+    # Flatten every price column into one Series so stripping and
+    # conversion run once over the whole block instead of per column
+    text = pd.Series(frame.to_numpy(dtype=object).ravel(), dtype='string').str.translate(_strip_spaces)
+    blank = (text.isna() | text.isin(['', '-'])).to_numpy(dtype=bool)
+    numbers = pd.to_numeric(text.mask(blank), errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    failed = np.isnan(numbers) & ~blank
+    return numbers.reshape(frame.shape), failed.reshape(frame.shape)
+
+def clean_prices(df, columns):
+    columns = list(columns)
+    values, failed = to_float_block(df[columns])
+    df[columns] = values
+    kept = df.notna().any(axis=1).to_numpy()
+    return df[kept], int(failed[kept].sum())
+
+COMPACT_CATEGORIES = ['Region', 'type', 'city']
+
+def compact_frame(df, float32=False):
+    # Repeated strings become categoricals, report_date a datetime64 and,
+    # optionally, prices float32 (exact for whole euros below 16.7 million)
+    df = df.copy()
+    for column in COMPACT_CATEGORIES:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    if 'report_date' in df.columns:
+        df['report_date'] = pd.to_datetime(df['report_date'], format='%Y-%m-%d')
+    if float32:
+        columns = df.select_dtypes('float64').columns
+        df[columns] = df[columns].astype('float32')
+    return df
+
+def concat_frames(frames):
+    # pd.concat turns categoricals with different categories back into
+    # objects, so align every frame on the union of categories first
+    frames = list(frames)
+    categorical = [c for c in frames[0].columns if isinstance(frames[0][c].dtype, pd.CategoricalDtype)]
+    for column in categorical:
+        categories = pd.api.types.union_categoricals([f[column] for f in frames if column in f.columns]).categories
+        frames = [f.assign(**{column: f[column].cat.set_categories(categories)}) if column in f.columns else f for f in frames]
+    return pd.concat(frames, ignore_index=True)
+
+def legacy_frame(df):
+    # The layout frames had before compaction: object strings and float64
+    df = df.copy()
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(object)
+        elif pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = df[column].dt.strftime('%Y-%m-%d').astype(object)
+        elif df[column].dtype == 'float32':
+            df[column] = df[column].astype('float64')
+    return df
+
+def memory_report(df, float32=False):
+    legacy = legacy_frame(df).memory_usage(deep=True, index=False)
+    compact = compact_frame(df, float32).memory_usage(deep=True, index=False)
+    report = pd.DataFrame({'legacy_bytes': legacy, 'compact_bytes': compact})
+    report.loc['total'] = report.sum()
+    report['ratio'] = (report['legacy_bytes'] / report['compact_bytes']).round(2)
+    return report
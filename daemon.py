@@ -0,0 +1,178 @@
+import json
+import signal
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import metrics
+
+# minute, hour, day of month, month, day of week (0 = Sunday, 7 also accepted)
+FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+ALIASES = {
+    '@hourly': '0 * * * *',
+    '@daily': '0 0 * * *',
+    '@weekly': '0 0 * * 0',
+    '@monthly': '0 0 1 * *',
+}
+
+def parse_field(text, low, high):
+    values = set()
+    for part in text.split(','):
+        step = 1
+        if '/' in part:
+            part, step_text = part.split('/', 1)
+            step = int(step_text)
+            if step < 1:
+                raise ValueError(f'Invalid cron step in {text!r}')
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = (int(v) for v in part.split('-', 1))
+        else:
+            start = end = int(part)
+            if step > 1:
+                end = high
+        if high == 6:
+            # Sunday may be written as 7
+            if not (low <= start <= end <= 7):
+                raise ValueError(f'Cron value out of range in {text!r}')
+            values.update(v % 7 for v in range(start, end + 1, step))
+            continue
+        if not (low <= start <= end <= high):
+            raise ValueError(f'Cron value out of range in {text!r}')
+        values.update(range(start, end + 1, step))
+    return values
+
+class CronSchedule:
+    def __init__(self, expression):
+        self.expression = expression
+        fields = ALIASES.get(expression, expression).split()
+        if len(fields) != 5:
+            raise ValueError(f'Expected 5 cron fields in {expression!r}')
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            parse_field(text, low, high) for text, (low, high) in zip(fields, FIELDS))
+        # As in cron: when both day fields are restricted, either one matching is enough
+        self.day_or_weekday = fields[2] != '*' and fields[4] != '*'
+
+    def _day_matches(self, moment):
+        day = moment.day in self.days
+        weekday = (moment.isoweekday() % 7) in self.weekdays
+        return (day or weekday) if self.day_or_weekday else (day and weekday)
+
+    def next_after(self, moment):
+        moment = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f'Cron expression {self.expression!r} never fires')
+
+class Daemon:
+    # Runs each job whenever its cron schedule comes due, one at a time in the
+    # calling thread. SIGTERM/SIGINT let the running job finish and then stop;
+    # a second signal exits at once. GET /health reports job state, /metrics
+    # the usual Prometheus metrics.
+    def __init__(self, jobs, run_job, health_port=None, health_host='127.0.0.1'):
+        self.jobs = jobs
+        self.run_job = run_job
+        self.health_port = health_port
+        self.health_host = health_host
+        self.started = time.time()
+        self.state = {name: {'schedule': schedule.expression, 'next_run': None, 'last_started': None,
+                             'last_finished': None, 'last_ok': None, 'last_error': None, 'runs': 0, 'failures': 0}
+                      for name, schedule, _ in jobs}
+        self._stop = threading.Event()
+        self._server = None
+
+    def stop(self, *signal_args):
+        if self._stop.is_set():
+            raise SystemExit(1)
+        print('Stopping after the current job...')
+        self._stop.set()
+
+    def health(self):
+        return {
+            'status': 'stopping' if self._stop.is_set() else 'ok',
+            'uptime_seconds': round(time.time() - self.started, 1),
+            'jobs': self.state,
+        }
+
+    def _start_health_server(self):
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/health':
+                    health = daemon.health()
+                    body = json.dumps(health).encode('utf-8')
+                    self.send_response(200 if health['status'] == 'ok' else 503)
+                    self.send_header('Content-Type', 'application/json')
+                elif self.path == '/metrics':
+                    body = metrics.registry.render().encode('utf-8')
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                else:
+                    body = b'Not found'
+                    self.send_response(404)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.health_host, self.health_port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def serve_forever(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        if self.health_port:
+            self._start_health_server()
+        next_runs = {}
+        now = datetime.now()
+        for name, schedule, _ in self.jobs:
+            next_runs[name] = schedule.next_after(now)
+            self.state[name]['next_run'] = next_runs[name].isoformat()
+        try:
+            while not self._stop.is_set():
+                name, schedule, payload = min(self.jobs, key=lambda job: next_runs[job[0]])
+                delay = (next_runs[name] - datetime.now()).total_seconds()
+                if delay > 0:
+                    self._stop.wait(min(delay, 60))
+                    continue
+                self._run(name, payload)
+                next_runs[name] = schedule.next_after(datetime.now())
+                self.state[name]['next_run'] = next_runs[name].isoformat()
+        finally:
+            if self._server is not None:
+                self._server.shutdown()
+
+    def _run(self, name, payload):
+        state = self.state[name]
+        state['last_started'] = datetime.now().isoformat(timespec='seconds')
+        state['runs'] += 1
+        try:
+            with metrics.timer('job'):
+                self.run_job(payload)
+        except Exception as e:
+            traceback.print_exc()
+            state['failures'] += 1
+            state['last_ok'] = False
+            state['last_error'] = f'{type(e).__name__}: {e}'
+            metrics.inc('imot_job_failures_total', job=name)
+        else:
+            state['last_ok'] = True
+            state['last_error'] = None
+        state['last_finished'] = datetime.now().isoformat(timespec='seconds')
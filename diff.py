@@ -0,0 +1,59 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from storage import load_snapshots, previous_report_date
+
+def value_columns(df):
+    return [c for c in df.columns if str(c).endswith(('_Price', '_Price_Sqm'))]
+
+def row_hashes(df, columns):
+    # One uint64 per region over its price cells, so unchanged regions are
+    # found by comparing integers instead of every cell
+    return pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+
+def diff_frames(current, previous, columns):
+    current = current.drop_duplicates('Region', keep='last').reset_index(drop=True)
+    previous = previous.drop_duplicates('Region', keep='last').reset_index(drop=True)
+    current_hashes = row_hashes(current, columns)
+    previous_hashes = row_hashes(previous, columns)
+
+    positions = pd.Index(previous['Region']).get_indexer(current['Region'])
+    matched = positions >= 0
+    changed = ~matched
+    changed[matched] = current_hashes[matched] != previous_hashes[positions[matched]]
+    removed = ~previous['Region'].isin(current['Region']).to_numpy()
+
+    rows = current.loc[changed, ['Region'] + columns].reset_index(drop=True)
+    before = np.full((len(rows), len(columns)), np.nan)
+    found = positions[changed]
+    before[found >= 0] = previous[columns].to_numpy(dtype='float64')[found[found >= 0]]
+    after = rows[columns].to_numpy(dtype='float64')
+    rows.insert(1, 'Change', np.where(found >= 0, 'changed', 'added'))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for j, column in enumerate(columns):
+            rows[f'{column}_Delta'] = after[:, j] - before[:, j]
+            rows[f'{column}_Delta_Pct'] = np.where(before[:, j] != 0, (after[:, j] - before[:, j]) / before[:, j] * 100, np.nan)
+
+    if removed.any():
+        gone = pd.DataFrame({'Region': previous.loc[removed, 'Region'].to_numpy(), 'Change': 'removed'})
+        rows = pd.concat([rows, gone], ignore_index=True)
+    return rows
+
+def diff_against_store(root, df, city, report_date, type):
+    # Returns (previous report date, changed rows); the rows are empty when
+    # nothing moved, and every region counts as added when there is no history
+    columns = value_columns(df)
+    previous_date = previous_report_date(root, city, type, report_date or date.today().isoformat())
+    if previous_date is None:
+        previous = pd.DataFrame(columns=['Region'] + columns)
+    else:
+        previous = load_snapshots(root, columns=['Region'] + columns, cities=[city],
+                                  date_from=previous_date, date_to=previous_date, types=[type])
+        previous['Region'] = previous['Region'].astype(object)
+    changes = diff_frames(df, previous, columns)
+    changes['report_date'] = report_date
+    changes['previous_date'] = previous_date
+    changes['type'] = type
+    return previous_date, changes
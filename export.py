@@ -0,0 +1,155 @@
+import csv
+import json
+import math
+import re
+
+from pipeline import EURO_COLUMN_WIDTH, EURO_FORMAT, HEADER_FORMAT, is_price_column
+
+LONG_COLUMNS = ['city', 'report_date', 'type', 'region', 'rooms', 'metric', 'value']
+
+_price_column = re.compile(r'^(\d+)_[A-Za-z]+_(Price(?:_Sqm)?)$')
+
+def melt_columns(columns):
+    # Map wide price columns such as 2_Bed_Price_Sqm to (rooms, metric)
+    mapping = {}
+    for column in columns:
+        match = _price_column.match(str(column))
+        if match:
+            mapping[column] = (match.group(1), match.group(2).lower())
+        elif column == 'Avg_Price_Sqm':
+            mapping[column] = ('all', 'price_sqm')
+    return mapping
+
+def long_rows(df, city=None):
+    mapping = melt_columns(df.columns)
+    for record in df.to_dict('records'):
+        row_city = record.get('city') or city
+        for column, (rooms, metric) in mapping.items():
+            value = record[column]
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                continue
+            yield (row_city, record.get('report_date'), record.get('type'), record.get('Region'), rooms, metric, float(value))
+
+class CsvSink:
+    def __init__(self, path):
+        self._file = open(path, 'w', encoding='utf-8', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(LONG_COLUMNS)
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class NdjsonSink:
+    def __init__(self, path):
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def write(self, rows):
+        for row in rows:
+            self._file.write(json.dumps(dict(zip(LONG_COLUMNS, row)), ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class ParquetSink:
+    # Every write() becomes one row group, so memory stays bounded by a page
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._schema = pa.schema([(name, pa.string()) for name in LONG_COLUMNS[:-1]] + [('value', pa.float64())])
+        self._writer = pq.ParquetWriter(path, self._schema, use_dictionary=LONG_COLUMNS[:-1])
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        if not columns:
+            return
+        arrays = [self._pa.array(values, type=field.type) for values, field in zip(columns, self._schema)]
+        self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+SINKS = {
+    '.csv': CsvSink,
+    '.ndjson': NdjsonSink,
+    '.jsonl': NdjsonSink,
+    '.parquet': ParquetSink,
+}
+
+def open_sink(path):
+    for extension, sink in SINKS.items():
+        if path.endswith(extension):
+            return sink(path)
+    raise ValueError(f"Unsupported stream format for {path}, use one of {', '.join(SINKS)}")
+
+class XlsxSink:
+    # Writes wide frames straight to disk through xlsxwriter's constant_memory
+    # mode: each row is flushed as soon as the next one starts, formats are
+    # applied once per column, and sheets roll over at Excel's row limit.
+    # Tables are not available in this mode, so sheets get an autofilter.
+    MAX_ROWS = 1048576
+
+    def __init__(self, path, split_by=None):
+        import xlsxwriter
+
+        self.split_by = split_by
+        self._workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+        self._header_format = self._workbook.add_format(HEADER_FORMAT)
+        self._euro_format = self._workbook.add_format(EURO_FORMAT)
+        self._sheets = {}
+        self._names = set()
+
+    def _sheet_name(self, key, part):
+        name = re.sub(r'[\[\]:*?/\\]', '_', str(key if key is not None else 'Sheet1'))[:25]
+        if part > 1:
+            name = f'{name} ({part})'
+        # Excel compares sheet names case-insensitively
+        while name.lower() in self._names:
+            name += '_'
+        self._names.add(name.lower())
+        return name
+
+    def _finish(self, sheet):
+        sheet['worksheet'].autofilter(0, 0, sheet['row'] - 1, len(sheet['columns']) - 1)
+
+    def _sheet(self, key, columns):
+        sheet = self._sheets.get(key)
+        if sheet is not None and sheet['row'] < self.MAX_ROWS:
+            return sheet
+        part = 1
+        if sheet is not None:
+            self._finish(sheet)
+            part = sheet['part'] + 1
+        worksheet = self._workbook.add_worksheet(self._sheet_name(key, part))
+        for col, column in enumerate(columns):
+            if is_price_column(column):
+                worksheet.set_column(col, col, EURO_COLUMN_WIDTH, self._euro_format)
+            worksheet.write_string(0, col, str(column), self._header_format)
+        worksheet.freeze_panes(1, 0)
+        sheet = {'worksheet': worksheet, 'row': 1, 'columns': columns, 'part': part}
+        self._sheets[key] = sheet
+        return sheet
+
+    def write(self, df):
+        columns = list(df.columns)
+        if self.split_by:
+            groups = df.groupby(self.split_by, sort=False, observed=True, dropna=False)
+        else:
+            groups = [(None, df)]
+        for key, part in groups:
+            for values in part.itertuples(index=False, name=None):
+                sheet = self._sheet(key, columns)
+                # NaN (missing prices) becomes an empty cell
+                sheet['worksheet'].write_row(sheet['row'], 0, [None if v != v else v for v in values])
+                sheet['row'] += 1
+
+    def close(self):
+        for sheet in self._sheets.values():
+            self._finish(sheet)
+        self._workbook.close()
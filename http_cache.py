@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import metrics
+
+def normalize_url(url):
+    parts = urlsplit(url.strip())
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', query, ''))
+
+def is_immutable(url):
+    # Pages for a past &date= snapshot are never republished
+    match = re.search(r'[?&]date=(\d{2}\.\d{2}\.\d{4})', url)
+    if not match:
+        return False
+    return datetime.strptime(match.group(1), '%d.%m.%Y').date() < date.today()
+
+class DirectoryCap:
+    # Keeps the files under a cache directory within max_bytes. The file mtime
+    # doubles as the LRU timestamp: touch() on every hit, and evict() drops the
+    # oldest files first until the directory is back under 90% of the cap.
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None
+
+    def touch(self, path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def replace(self, tmp_path, path):
+        # os.replace() that counts the new file against the cap
+        try:
+            old_size = os.path.getsize(path)
+        except OSError:
+            old_size = 0
+        os.replace(tmp_path, path)
+        with self._lock:
+            if self._size is None:
+                self._size = self.disk_usage()
+            else:
+                self._size += os.path.getsize(path) - old_size
+            if self._size > self.max_bytes:
+                self.evict()
+
+    def remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size -= size
+
+    def entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def disk_usage(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        entries = sorted(self.entries())
+        self._size = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
+
+class ResponseCache:
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.cap = DirectoryCap(directory, max_bytes)
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, url):
+        key = hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key[:2], key)
+
+    def load(self, path):
+        try:
+            with open(path, 'rb') as f:
+                meta = json.loads(f.readline())
+                body = f.read()
+        except (OSError, ValueError):
+            return None, None
+        if len(body) != meta.get('size'):
+            return None, None
+        return meta, body
+
+    def touch(self, path):
+        self.cap.touch(path)
+
+    def store(self, path, meta, body):
+        meta['size'] = len(body)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(json.dumps(meta).encode('utf-8') + b'\n')
+            f.write(body)
+        self.cap.replace(tmp_path, path)
+
+    def disk_usage(self):
+        return self.cap.disk_usage()
+
+    def fetch(self, url, get):
+        path = self.path_for(url)
+        meta, body = self.load(path)
+        if meta is not None and meta.get('immutable'):
+            self.touch(path)
+            metrics.inc('imot_http_cache_total', result='hit')
+            return body
+
+        headers = {}
+        if meta is not None:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        response = get(url, headers=headers)
+        if response.status_code == 304 and meta is not None:
+            self.touch(path)
+            metrics.inc('imot_http_cache_total', result='revalidated')
+            return body
+        metrics.inc('imot_http_cache_total', result='miss')
+        response.raise_for_status()
+
+        meta = {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'stored_at': time.time(),
+            'immutable': is_immutable(url),
+        }
+        self.store(path, meta, response.content)
+        return response.content
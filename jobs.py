@@ -0,0 +1,58 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+class JobQueue:
+    def __init__(self, max_workers=4, max_jobs=1000):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='imot-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.max_jobs = max_jobs
+
+    def submit(self, func, *args, **kwargs):
+        job_id = uuid.uuid4().hex
+        job = {
+            'id': job_id,
+            'status': 'queued',
+            'submitted_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'error': None,
+            'result': None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._prune()
+        self._pool.submit(self._run, job, func, args, kwargs)
+        return job_id
+
+    def _run(self, job, func, args, kwargs):
+        job['status'] = 'running'
+        job['started_at'] = time.time()
+        try:
+            job['result'] = func(*args, **kwargs)
+            job['status'] = 'finished'
+        except Exception as e:
+            job['error'] = str(e)
+            job['status'] = 'failed'
+        job['finished_at'] = time.time()
+
+    def _prune(self):
+        # Forget the oldest completed jobs once we hold more than max_jobs
+        excess = len(self._jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        done = [job_id for job_id, job in self._jobs.items() if job['status'] in ('finished', 'failed')]
+        for job_id in done[:excess]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def status(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return None
+        return {key: value for key, value in job.items() if key != 'result'}
@@ -0,0 +1,163 @@
+import bisect
+import threading
+import time
+
+# Upper bounds in seconds; a page fetch sits in the tens to hundreds of ms,
+# parse/clean/write in single-digit ms
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+DESCRIPTIONS = {
+    'imot_stage_seconds': 'Time spent in each pipeline stage.',
+    'imot_downloaded_bytes_total': 'Response body bytes received from the network.',
+    'imot_http_requests_total': 'HTTP responses received, by status code.',
+    'imot_http_errors_total': 'Requests that failed with a connection error or timeout.',
+    'imot_http_cache_total': 'HTTP cache lookups: hit, revalidated (304) or miss.',
+    'imot_rows_total': 'Rows produced by the clean stage.',
+}
+
+class _Timer:
+    __slots__ = ('registry', 'stage', 'start')
+
+    def __init__(self, registry, stage):
+        self.registry = registry
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe('imot_stage_seconds', time.perf_counter() - self.start, stage=self.stage)
+
+class Metrics:
+    # Counters and fixed-bucket histograms behind one lock; recording a value
+    # is a dict lookup and a bisect, cheap enough to leave on everywhere
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._callbacks = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        index = bisect.bisect_left(BUCKETS, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def timer(self, stage):
+        return _Timer(self, stage)
+
+    def register(self, name, func, type='gauge', help=None):
+        # func is called at scrape time and returns a number
+        self._callbacks[name] = (func, type, help)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'histograms': {key: [list(h[0]), h[1], h[2]] for key, h in self._histograms.items()},
+            }
+
+    def since(self, before):
+        # What was recorded after `before` was taken, e.g. by one worker chunk
+        now = self.snapshot()
+        counters = {key: value - before['counters'].get(key, 0) for key, value in now['counters'].items()}
+        histograms = {}
+        for key, (buckets, total, count) in now['histograms'].items():
+            old = before['histograms'].get(key, [[0] * len(buckets), 0.0, 0])
+            histograms[key] = [[a - b for a, b in zip(buckets, old[0])], total - old[1], count - old[2]]
+        return {'counters': {k: v for k, v in counters.items() if v},
+                'histograms': {k: h for k, h in histograms.items() if h[2]}}
+
+    def merge(self, snapshot):
+        with self._lock:
+            for key, value in snapshot['counters'].items():
+                self._counters[key] = self._counters.get(key, 0) + value
+            for key, (buckets, total, count) in snapshot['histograms'].items():
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+                histogram[0] = [a + b for a, b in zip(histogram[0], buckets)]
+                histogram[1] += total
+                histogram[2] += count
+
+    def render(self):
+        # Prometheus text exposition format
+        snapshot = self.snapshot()
+        lines = []
+        seen = set()
+
+        def header(name, type, help=None):
+            if name not in seen:
+                seen.add(name)
+                lines.append(f'# HELP {name} {help or DESCRIPTIONS.get(name, name)}')
+                lines.append(f'# TYPE {name} {type}')
+
+        def label_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ''
+            return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+        for (name, labels), value in sorted(snapshot['counters'].items()):
+            header(name, 'counter')
+            lines.append(f'{name}{label_text(labels)} {value}')
+        for (name, labels), (buckets, total, count) in sorted(snapshot['histograms'].items()):
+            header(name, 'histogram')
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS + ('+Inf',), buckets):
+                cumulative += bucket
+                lines.append(f'{name}_bucket{label_text(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_sum{label_text(labels)} {total}')
+            lines.append(f'{name}_count{label_text(labels)} {count}')
+        for name, (func, type, help) in sorted(self._callbacks.items()):
+            header(name, type, help)
+            lines.append(f'{name} {func()}')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self, snapshot=None):
+        # Per-stage count, total and approximate percentiles (bucket upper bounds),
+        # of everything so far or of a snapshot/since() delta
+        if snapshot is None:
+            snapshot = self.snapshot()
+        stages = {}
+        for (name, labels), (buckets, total, count) in snapshot['histograms'].items():
+            if name != 'imot_stage_seconds':
+                continue
+            stages[dict(labels)['stage']] = {
+                'count': count,
+                'seconds': round(total, 4),
+                'mean_ms': round(total / count * 1000, 3),
+                'p50_ms': _quantile_ms(buckets, count, 0.50),
+                'p99_ms': _quantile_ms(buckets, count, 0.99),
+            }
+        counters = {}
+        for (name, labels), value in sorted(snapshot['counters'].items()):
+            key = name + ''.join(f'.{v}' for _, v in labels)
+            counters[key] = value
+        return {'stages': stages, 'counters': counters}
+
+def _quantile_ms(buckets, count, q):
+    # None when the quantile falls past the last bucket
+    rank = q * count
+    cumulative = 0
+    for bound, bucket in zip(BUCKETS, buckets):
+        cumulative += bucket
+        if cumulative >= rank:
+            return bound * 1000
+    return None
+
+registry = Metrics()
+inc = registry.inc
+observe = registry.observe
+timer = registry.timer
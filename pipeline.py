@@ -0,0 +1,168 @@
+import re
+from datetime import datetime
+
+import metrics
+
+# pandas, lxml and xlsxwriter are imported inside the stages that need them,
+# so importing this module (and answering --help) stays cheap
+
+TABLE_ID = 'tableStats'
+TABLE_STYLE = 'Table Style Medium 9'
+
+# Shared by write_workbook and export.XlsxSink
+HEADER_FORMAT = {
+    'bold': True,
+    'text_wrap': True,
+    'valign': 'top',
+    'fg_color': '#007ddf',  # blue
+    'font_color': '#FFFFFF',  # white
+    'border': 1
+}
+EURO_FORMAT = {'num_format': '€ #,##0.00', 'align': 'right'}
+EURO_COLUMN_WIDTH = 18
+
+def is_price_column(column):
+    return str(column).endswith(('_Price', '_Price_Sqm'))
+
+def extract_date_from_url(url):
+    match = re.search(r'&date=(\d{2}\.\d{2}\.\d{4})', url)
+    if match:
+        date_str = match.group(1)
+        return datetime.strptime(date_str, '%d.%m.%Y').strftime('%Y-%m-%d')
+    else:
+        return None
+
+def price_columns(label='Room'):
+    columns = []
+    for rooms in (1, 2, 3):
+        columns += [f'{rooms}_{label}_Price', f'{rooms}_{label}_Price_Sqm']
+    return columns + ['Avg_Price_Sqm']
+
+def fetch_page(url):
+    import transport
+
+    return transport.fetch(url)
+
+def parse_page(content, table_id=TABLE_ID):
+    from table_parser import parse_table
+
+    return parse_table(content, table_id)
+
+def parse_page_bs4(content, table_id=TABLE_ID):
+    from table_parser import parse_table_bs4
+
+    return parse_table_bs4(content, table_id)
+
+def post_process_dataframe(df, report_date, label='Room', legacy_layout=False):
+    from cleaning import clean_prices, note_rows
+    from schema import apply_schema, detect_schema
+
+    schema = detect_schema(df, legacy_layout)
+    df = df[~note_rows(df[df.columns[0]])]
+    df = apply_schema(df, schema, label)
+    # Section rows with no price cells at all (not even '-') carry no data
+    df = df[df[df.columns[1:]].notna().any(axis=1)]
+    df, failures = clean_prices(df, df.columns[1:])
+
+    # Remove rows without a region and repeats of the header row
+    headers = {'район', schema['header_label'].lower()}
+    df = df[df['Region'].notna()]
+    df = df[~df['Region'].str.strip().str.lower().isin(headers)].copy()
+
+    df['report_date'] = report_date
+    df.attrs['coerce_failures'] = failures
+    return df
+
+def write_workbook(df, target, table_style=TABLE_STYLE):
+    import pandas as pd
+
+    # target is a file name or a binary buffer; buffers are built in memory
+    options = {} if isinstance(target, str) else {'in_memory': True}
+    writer = pd.ExcelWriter(target, engine='xlsxwriter', date_format='yyyy-mm-dd', datetime_format='yyyy-mm-dd',
+                            engine_kwargs={'options': options})
+    df.to_excel(writer, sheet_name='Sheet1', index=False)
+
+    workbook = writer.book
+    worksheet = writer.sheets['Sheet1']
+
+    # Define header format
+    header_format = workbook.add_format(HEADER_FORMAT)
+
+    # Apply the Euro accounting format to the price columns
+    euro_format = workbook.add_format(EURO_FORMAT)
+    for col_idx, column in enumerate(df.columns):
+        if is_price_column(column):
+            worksheet.set_column(col_idx, col_idx, EURO_COLUMN_WIDTH, euro_format)
+
+    # Apply the header format to the header row
+    for col_num, value in enumerate(df.columns):
+        worksheet.write(0, col_num, value, header_format)
+
+    # Apply the table format to the entire range of the DataFrame
+    column_settings = [{'header': column_name, 'header_format': header_format} for column_name in df.columns]
+    worksheet.add_table(0, 0, len(df.index), len(df.columns) - 1, {'columns': column_settings, 'style': table_style})
+
+    writer.close()
+
+def open_in_excel(file_name):
+    import subprocess
+
+    subprocess.run(["open", "-a", "Microsoft Excel", file_name])
+    script = '''
+        tell application "Microsoft Excel"
+            activate
+        end tell
+    '''
+    subprocess.run(["osascript", "-e", script])
+
+class Pipeline:
+    # fetch -> locate/parse -> clean -> emit. Each stage is a plain callable
+    # and can be swapped, e.g. parse=parse_page_bs4 or fetch reading from disk.
+    def __init__(self, fetch=fetch_page, parse=parse_page, clean=post_process_dataframe, emit=write_workbook, label='Room'):
+        self.fetch = fetch
+        self.parse = parse
+        self.clean = clean
+        self.emit = emit
+        self.label = label
+
+    def process(self, url, type=None):
+        with metrics.timer('fetch'):
+            content = self.fetch(url)
+        return self.process_content(content, url, type)
+
+    def process_content(self, content, url, type=None):
+        with metrics.timer('parse'):
+            table_df = self.parse(content)
+        if table_df is None:
+            return None
+        with metrics.timer('clean'):
+            df = self.clean(table_df, extract_date_from_url(url), self.label)
+        if type is not None:
+            df['type'] = type
+        metrics.inc('imot_rows_total', len(df), type=type or 'all')
+        return df
+
+    def export(self, df, target, **options):
+        with metrics.timer('write'):
+            return self.emit(df, target, **options)
+
+def frame_to_columns(df):
+    # Plain column arrays pickle far smaller and faster than a DataFrame
+    return {'columns': {name: df[name].to_numpy() for name in df.columns}, 'attrs': dict(df.attrs)}
+
+def frame_from_columns(result):
+    import pandas as pd
+
+    df = pd.DataFrame(result['columns'])
+    df.attrs.update(result['attrs'])
+    return df
+
+def process_chunk(pipeline, items):
+    # Runs in a worker process: parse and clean raw pages, return column arrays
+    # together with the metrics recorded meanwhile, for the parent to merge
+    before = metrics.registry.snapshot()
+    results = []
+    for content, url, type in items:
+        df = pipeline.process_content(content, url, type)
+        results.append(None if df is None else frame_to_columns(df))
+    return results, metrics.registry.since(before)
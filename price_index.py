@@ -0,0 +1,82 @@
+import sqlite3
+import threading
+from datetime import date
+
+from export import LONG_COLUMNS, long_rows
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS prices (
+    city TEXT NOT NULL,
+    region TEXT NOT NULL,
+    report_date TEXT NOT NULL,
+    type TEXT NOT NULL,
+    rooms TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (city, region, report_date, type, rooms, metric)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS prices_by_date ON prices (city, report_date, type);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta VALUES ('version', 0);
+'''
+
+FILTERS = {
+    'city': 'city = ?',
+    'region': 'region = ?',
+    'type': 'type = ?',
+    'rooms': 'rooms = ?',
+    'metric': 'metric = ?',
+    'from': 'report_date >= ?',
+    'to': 'report_date <= ?',
+}
+
+class PriceIndex:
+    # Long-format prices in SQLite, clustered on (city, region, report_date,
+    # type) so a region's history is one range scan; prices_by_date covers
+    # queries without a region. version goes up with every write and is what
+    # the API's ETags are derived from.
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def add_frame(self, df, city=None):
+        # Current pages carry no report date, they are indexed under the day they were scraped
+        today = date.today().isoformat()
+        rows = [(row_city or 'unknown', region, report_date or today, type or 'all', rooms, metric, value)
+                for row_city, report_date, type, region, rooms, metric, value in long_rows(df, city)
+                if region is not None]
+        connection = self._connection()
+        with self._write_lock, connection:
+            connection.executemany('INSERT OR REPLACE INTO prices (city, region, report_date, type, rooms, metric, value) '
+                                   'VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+            connection.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+        return len(rows)
+
+    def version(self):
+        return self._connection().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    def query(self, limit=None, **filters):
+        unknown = set(filters) - set(FILTERS)
+        if unknown:
+            raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+        conditions = [FILTERS[name] for name, value in filters.items() if value]
+        values = [value for value in filters.values() if value]
+        sql = f"SELECT {', '.join(LONG_COLUMNS)} FROM prices"
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY city, region, report_date, type, rooms, metric'
+        if limit is not None:
+            # SQLite reads a negative LIMIT as no limit at all
+            sql += f' LIMIT {max(0, int(limit))}'
+        return self._connection().execute(sql, values).fetchall()
@@ -0,0 +1,237 @@
+import heapq
+import itertools
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import metrics
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+_local = threading.local()
+_tickets = itertools.count()
+
+def current_priority():
+    return getattr(_local, 'priority', BACKGROUND)
+
+@contextmanager
+def lane(priority):
+    # Requests made by this thread inside the block queue in the given lane
+    previous = current_priority()
+    _local.priority = priority
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+class SharedBucket:
+    # Per-host token buckets in a SQLite file, so every process pointed at the
+    # same file (the app, CLI runs, the daemon) draws from one request budget
+    # and honours one Retry-After pause. Background requests leave `reserve`
+    # tokens untouched; those are what lets an interactive request from
+    # another process go ahead of a running backfill.
+    def __init__(self, path, rate, burst, reserve=1):
+        self.path = path
+        self.rate = rate
+        self.reserve = reserve
+        self.burst = max(burst, reserve + 1)
+        self._local = threading.local()
+        self._connection().execute('CREATE TABLE IF NOT EXISTS buckets (host TEXT PRIMARY KEY, tokens REAL NOT NULL, '
+                                   'updated REAL NOT NULL, paused_until REAL NOT NULL)')
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+        return connection
+
+    def take(self, host, priority=BACKGROUND):
+        # None once a token was taken, otherwise seconds to wait before asking again
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT tokens, updated, paused_until FROM buckets WHERE host = ?', (host,)).fetchone()
+            now = time.time()
+            tokens, updated, paused_until = row if row else (self.burst, now, 0.0)
+            tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+            floor = 1 if priority == INTERACTIVE else 1 + self.reserve
+            delay = None
+            if now < paused_until:
+                delay = paused_until - now
+            elif tokens < floor:
+                delay = (floor - tokens) / self.rate
+            else:
+                tokens -= 1
+            connection.execute('INSERT OR REPLACE INTO buckets VALUES (?, ?, ?, ?)', (host, tokens, now, paused_until))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return delay
+
+    def pause(self, host, seconds):
+        until = time.time() + seconds
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute('INSERT OR IGNORE INTO buckets VALUES (?, ?, ?, 0)', (host, self.burst, time.time()))
+            connection.execute('UPDATE buckets SET paused_until = MAX(paused_until, ?) WHERE host = ?', (until, host))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+class HostLimiter:
+    # A token bucket caps the request rate; an AIMD window caps requests in
+    # flight: +1/window per healthy response, halved (at most once per
+    # cooldown) on 429, 5xx, connection errors or a latency spike. Waiters are
+    # served lowest priority number first, then in arrival order. With a
+    # SharedBucket the rate and Retry-After pauses come from there instead.
+    def __init__(self, rate, burst, concurrency, max_concurrency, latency_factor, cooldown, shared=None, host=None):
+        self.rate = rate
+        self.shared = shared
+        self.host = host
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.latency_factor = latency_factor
+        self.cooldown = cooldown
+        self.limit = float(concurrency)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.latency = None
+        self.samples = 0
+        self.last_decrease = 0.0
+        self._waiting = []
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        if self.rate:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _wait_time(self, ticket, now):
+        # None when the ticket may go now, otherwise how long to wait (0 = until notified)
+        if self._waiting[0] != ticket or self.in_flight >= int(self.limit):
+            return 0
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.shared is not None:
+            return self.shared.take(self.host, ticket[0]) if self.rate else None
+        if self.rate and self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        return None
+
+    def acquire(self, priority=BACKGROUND):
+        ticket = (priority, next(_tickets))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    delay = self._wait_time(ticket, now)
+                    if delay is None:
+                        break
+                    self._cond.wait(delay or None)
+            except BaseException:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+                raise
+            heapq.heappop(self._waiting)
+            if self.rate and self.shared is None:
+                self.tokens -= 1
+            self.in_flight += 1
+            self._cond.notify_all()
+
+    def release(self, status=None, latency=None, retry_after=None):
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            overloaded = status is None or status == 429 or status >= 500
+            if not overloaded and latency is not None:
+                if self.samples >= 5 and latency > self.latency_factor * self.latency:
+                    overloaded = True
+                else:
+                    self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+                    self.samples += 1
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+                if self.shared is not None:
+                    self.shared.pause(self.host, retry_after)
+            if overloaded:
+                if now - self.last_decrease >= self.cooldown:
+                    self.limit = max(1.0, self.limit / 2)
+                    self.last_decrease = now
+                    metrics.inc('imot_rate_limit_backoffs_total')
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'limit': round(self.limit, 2),
+                'in_flight': self.in_flight,
+                'waiting': len(self._waiting),
+                'tokens': round(self.tokens, 2),
+                'latency_ms': None if self.latency is None else round(self.latency * 1000, 1),
+            }
+
+class _Slot:
+    def __init__(self, limiter, priority):
+        self.limiter = limiter
+        self.priority = priority
+        self.status = None
+        self.retry_after = None
+
+    def record(self, status, retry_after=None):
+        self.status = status
+        self.retry_after = retry_after
+
+    def __enter__(self):
+        self.limiter.acquire(self.priority)
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        self.limiter.release(self.status, time.monotonic() - self.start, self.retry_after)
+
+class Scheduler:
+    # One HostLimiter per host, created on first use with the same settings;
+    # shared_path puts the rate budget in a SharedBucket file
+    def __init__(self, rate=4.0, burst=None, concurrency=2, max_concurrency=8, latency_factor=3.0, cooldown=1.0,
+                 shared_path=None):
+        self.options = {
+            'rate': rate,
+            'burst': burst if burst is not None else max(1, int(rate or 1)),
+            'concurrency': min(concurrency, max_concurrency),
+            'max_concurrency': max_concurrency,
+            'latency_factor': latency_factor,
+            'cooldown': cooldown,
+        }
+        self.shared = SharedBucket(shared_path, rate, self.options['burst']) if shared_path and rate else None
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def host(self, host):
+        with self._lock:
+            limiter = self._hosts.get(host)
+            if limiter is None:
+                limiter = self._hosts[host] = HostLimiter(**self.options, shared=self.shared, host=host)
+            return limiter
+
+    def slot(self, url, priority=None):
+        return _Slot(self.host(urlsplit(url).netloc), current_priority() if priority is None else priority)
+
+    def stats(self):
+        with self._lock:
+            hosts = dict(self._hosts)
+        return {host: limiter.stats() for host, limiter in hosts.items()}
@@ -0,0 +1,106 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from http_cache import DirectoryCap, is_immutable, normalize_url
+
+class ResultCache:
+    # Processed results keyed by normalized URL. Past-dated pages never
+    # expire; current pages live for ttl seconds. The in-memory copy is
+    # bounded by max_bytes and evicted least recently used first; when a
+    # directory is given, entries are also pickled there and survive restarts.
+    # The directory is capped at max_disk_bytes, least recently used first.
+    def __init__(self, max_bytes=256 * 1024 * 1024, ttl=900, directory=None, max_disk_bytes=1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.cap = None
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if directory:
+            self.cap = DirectoryCap(directory, max_disk_bytes)
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.pickle')
+
+    def get(self, url):
+        key = normalize_url(url)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, size, value = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+        if self.directory:
+            try:
+                with open(self._path(key), 'rb') as f:
+                    expires_at, size, value = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+                pass
+            else:
+                if expires_at is None or expires_at > now:
+                    self.cap.touch(self._path(key))
+                    with self._lock:
+                        self.hits += 1
+                        self._insert(key, (expires_at, size, value))
+                    return value
+                self.cap.remove(self._path(key))
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, url, value, size):
+        key = normalize_url(url)
+        expires_at = None if is_immutable(url) else time.time() + self.ttl
+        entry = (expires_at, size, value)
+        with self._lock:
+            self._insert(key, entry)
+        if self.directory:
+            path = self._path(key)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            self.cap.replace(tmp_path, path)
+
+    def disk_usage(self):
+        return self.cap.disk_usage() if self.cap is not None else 0
+
+    def _insert(self, key, entry):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._bytes += entry[1]
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import re
+
+# Column mappings are derived once per distinct header and reused for every
+# page with the same fingerprint; a header nobody has seen and that cannot be
+# mapped fails loudly instead of shifting prices into the wrong columns. Only
+# with legacy=True (--legacy-layout) may unlabelled tables be mapped by position.
+
+ROOM_WORDS = (('едно', '1'), ('дву', '2'), ('три', '3'))
+AVERAGE_WORD = 'средн'
+
+class SchemaError(ValueError):
+    pass
+
+_schemas = {}
+
+def _text(value):
+    if value is None or value != value:
+        return ''
+    return str(value).strip()
+
+def _header_label(column):
+    # pandas names blank header cells 'Unnamed: N' and repeats 'X.1', 'X.2'
+    label = _text(column)
+    if label.startswith('Unnamed:'):
+        return ''
+    return re.sub(r'\.\d+$', '', label)
+
+def has_subheader(df):
+    # A second header row: no region and only labels (no digits) in the value cells
+    if df.empty or _text(df.iat[0, 0]):
+        return False
+    cells = [_text(v) for v in df.iloc[0, 1:]]
+    return any(cells) and not any(re.search(r'\d', c) for c in cells)
+
+def fingerprint(df):
+    header = [_text(c) for c in df.columns]
+    subheader = [_text(v) for v in df.iloc[0]] if has_subheader(df) else []
+    return hashlib.sha1(json.dumps([header, subheader], ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
+def _rooms(label):
+    lowered = label.lower()
+    digits = re.match(r'(\d)', lowered)
+    if digits:
+        return digits.group(1)
+    for word, rooms in ROOM_WORDS:
+        if lowered.startswith(word):
+            return rooms
+    return None
+
+def _legacy_layout(header, subheader):
+    # The layout the positional code was written against: Region, then
+    # (price, price/sqm) for 1-3 rooms and the average, blank spacers at 1, 4, 7, 10
+    if len(header) != 12 or any(header[i] or subheader[i] for i in (1, 4, 7, 10)):
+        return None
+    targets = [('1', 'Price'), ('1', 'Price_Sqm'), ('2', 'Price'), ('2', 'Price_Sqm'),
+               ('3', 'Price'), ('3', 'Price_Sqm'), ('all', 'Price_Sqm')]
+    return list(zip((2, 3, 5, 6, 8, 9, 11), targets))
+
+def infer_schema(df, legacy=False):
+    subheader_rows = 1 if has_subheader(df) else 0
+    header = [_header_label(c) for c in df.columns]
+    subheader = [_text(v) for v in df.iloc[0]] if subheader_rows else [''] * len(header)
+    columns = []
+    unknown = []
+    for position in range(1, len(header)):
+        label, sublabel = header[position], subheader[position]
+        if not label and not sublabel:
+            continue  # spacer column
+        metric = 'Price_Sqm' if 'кв' in (sublabel or label).lower() else 'Price'
+        if label.lower().startswith(AVERAGE_WORD):
+            columns.append((position, ('all', 'Price_Sqm')))
+        elif _rooms(label):
+            columns.append((position, (_rooms(label), metric)))
+        else:
+            unknown.append(position)
+    targets = [target for _, target in columns]
+    if unknown or len(set(targets)) != len(targets):
+        columns = _legacy_layout(header, subheader) if legacy else None
+        if columns is None:
+            return None
+        print(f"Mapping tableStats layout {fingerprint(df)} by position: columns {[_text(c) for c in df.columns]}")
+    return {'subheader_rows': subheader_rows, 'header_label': header[0], 'columns': columns}
+
+def detect_schema(df, legacy=False):
+    key = fingerprint(df)
+    schema = _schemas.get((key, legacy))
+    if schema is None:
+        schema = infer_schema(df, legacy)
+        if schema is None:
+            raise SchemaError(f"Unrecognised tableStats layout {key}: columns {[_text(c) for c in df.columns]}")
+        _schemas[(key, legacy)] = schema
+    return schema
+
+def apply_schema(df, schema, label='Room'):
+    from pipeline import price_columns
+
+    names = {}
+    for position, (rooms, metric) in schema['columns']:
+        names[position] = 'Avg_Price_Sqm' if rooms == 'all' else f'{rooms}_{label}_{metric}'
+    expected = price_columns(label)
+    missing = [name for name in expected if name not in names.values()]
+    if missing:
+        raise SchemaError(f"tableStats layout is missing {', '.join(missing)}")
+    order = {name: position for position, name in names.items()}
+    frame = df.iloc[schema['subheader_rows']:, [0] + [order[name] for name in expected]]
+    frame.columns = ['Region'] + expected
+    return frame
@@ -1,105 +1,528 @@
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
-import numpy as np
 import argparse
+import json
 import os
-import subprocess
-import re
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+# requests, pandas and pyarrow are imported only once a page actually has to be
+# fetched or written, so --help and up-to-date runs start in a few milliseconds
+from http_cache import ResponseCache, is_immutable
+from pipeline import (Pipeline, extract_date_from_url, frame_from_columns, open_in_excel, parse_page, parse_page_bs4,
+                      post_process_dataframe, process_chunk)
+from backfill import CompletionLog
+from archive import PageArchive
+import metrics
 
 # Set up argument parsing
 parser = argparse.ArgumentParser(description='Scrape data from a given URL into an Excel file.')
-parser.add_argument('-l', '--url', required=True, help='Base URL of the page to scrape.')
+source = parser.add_mutually_exclusive_group()
+source.add_argument('-l', '--url', help='Base URL of the page to scrape.')
+source.add_argument('-m', '--manifest', help='File with one base URL per line (optionally prefixed by a city name) to scrape as a batch.')
+source.add_argument('-c', '--cities', nargs='+', help='Cities to scrape as a batch, expanded through --url-template over --date-from/--date-to.')
+parser.add_argument('--daemon', help='Stay running and execute the scrapes listed in this schedule file (one "<cron expression> <scraper options>" per line) whenever they are due, keeping connections and caches warm.')
+parser.add_argument('--health-host', default='127.0.0.1', help='Address the --daemon /health and /metrics endpoints listen on.')
+parser.add_argument('--health-port', type=int, default=8081, help='Port for the --daemon /health and /metrics endpoints (0 disables them).')
+parser.add_argument('--replay', help='Re-run parse, clean and export from the raw pages in this --archive directory without any network access; without a source every archived page is replayed.')
 parser.add_argument('-o', '--output', default='scrape', help='Output Excel file name (without extension).')
+parser.add_argument('--store', help='Append results to a Parquet dataset in this directory, partitioned by city and report date.')
+parser.add_argument('--index', help='Also upsert results into this SQLite price index, served by the app under /api/prices (IMOT_INDEX).')
+parser.add_argument('--aggregates', help='Fold every page into the monthly per-region rollups kept in this directory (trends, MoM/YoY, rental yield; served by the app under /api/trends).')
+parser.add_argument('--city', help='City recorded in the store for pages without one, defaults to --output.')
+parser.add_argument('--incremental', action='store_true', help='Only fetch (city, date, type) snapshots missing from --store, storing each as soon as it arrives.')
+parser.add_argument('--diff', action='store_true', help='Compare each page with the previous report date in --store and only output changed regions with their deltas; unchanged pages are not written at all.')
+parser.add_argument('--stream', help='Write tidy long-format rows to this .csv, .ndjson or .parquet file as each page is parsed; together with --no-xlsx or --constant-memory batches keep no frames in memory.')
+parser.add_argument('--constant-memory', action='store_true', help='Write the workbook row by row with xlsxwriter constant_memory mode as pages arrive.')
+parser.add_argument('--split-sheets', choices=['city', 'type'], help='Write one sheet per city or per type (implies --constant-memory).')
+parser.add_argument('--no-xlsx', action='store_true', help='Skip writing the Excel file, e.g. when only --store is wanted.')
+parser.add_argument('--compact', action='store_true', help='Hold the combined frame with categorical Region/type/city and a datetime64 report_date instead of repeated strings.')
+parser.add_argument('--float32', action='store_true', help='With --compact, also store prices as float32.')
+parser.add_argument('--memory-report', action='store_true', help='Print per-column memory of the combined frame in the current and the compact layout.')
 parser.add_argument('-e', '--excel', action='store_true', help='Open the output file in Excel after creation.')
-args = parser.parse_args()
+parser.add_argument('--url-template', help='Base URL with {city} and {date} (dd.mm.yyyy) placeholders, used with --cities.')
+parser.add_argument('--date-from', help='First report date (YYYY-MM-DD) used with --cities.')
+parser.add_argument('--date-to', help='Last report date (YYYY-MM-DD) used with --cities, defaults to --date-from.')
+parser.add_argument('--step-days', type=int, default=1, help='Days between report dates used with --cities.')
+parser.add_argument('-w', '--workers', type=int, default=8, help='Number of pages fetched concurrently in batch mode.')
+parser.add_argument('--per-host', type=int, default=4, help='Maximum concurrent requests to a single host in batch mode.')
+parser.add_argument('--rate', type=float, default=4.0, help='Requests per second per host; concurrency then adapts between 1 and --per-host, backing off on 429/5xx and latency spikes (0 disables the limiter).')
+parser.add_argument('--rate-file', help='SQLite file holding the --rate budget, shared with other runs, the daemon and the app (IMOT_RATE_FILE) so together they stay under it; interactive app requests go first.')
+parser.add_argument('--pool-size', type=int, default=16, help='Number of keep-alive connections kept per host.')
+parser.add_argument('--timeout', type=float, default=30.0, help='Read timeout in seconds for each request.')
+parser.add_argument('--cache-dir', help='Directory for the on-disk HTTP cache; past-dated pages are served from it without a request.')
+parser.add_argument('--cache-mb', type=int, default=512, help='Size cap of the HTTP cache in megabytes.')
+parser.add_argument('--parser', choices=['fast', 'bs4'], default='fast', help='Table parser: streaming lxml extractor or the BeautifulSoup + read_html fallback.')
+parser.add_argument('--legacy-layout', action='store_true', help='Map tables whose headers are not recognised by position (the old fixed 12-column layout) instead of failing; the layout fingerprint is printed.')
+parser.add_argument('--archive', help='Keep every fetched page, compressed and content-addressed, in this directory for later --replay.')
+parser.add_argument('--parse-workers', type=int, help='Parse and clean batch pages in this many worker processes (0 parses in the fetch threads; defaults to 0, or one per CPU with --replay).')
+parser.add_argument('--chunk-size', type=int, default=8, help='Pages handed to a parse worker at a time.')
+parser.add_argument('--retries', type=int, default=4, help='Retries on connection errors, 429 and 5xx responses.')
+parser.add_argument('--timings', nargs='?', const='-', help='Write a JSON timing summary (per-stage histograms, bytes, rows, cache hits) to this file, or stdout when no file is given.')
+parser.add_argument('--force', action='store_true', help='Re-scrape a past report date even if its output already exists.')
 
-def extract_date_from_url(url):
-    match = re.search(r'&date=(\d{2}\.\d{2}\.\d{4})', url)
-    if match:
-        date_str = match.group(1)
-        return datetime.strptime(date_str, '%d.%m.%Y').strftime('%Y-%m-%d')
-    else:
-        return None
+TYPES = ['sales', 'rent']
+# Applied once by setup() from the daemon's own command line, so a schedule line may not set them
+DAEMON_OPTIONS = ['daemon', 'health_host', 'health_port', 'parser', 'legacy_layout', 'rate', 'rate_file', 'pool_size',
+                  'timeout', 'retries', 'cache_dir', 'cache_mb']
 
-def fetch_and_parse_data(url, type):
-    response = requests.get(url)
-    response.raise_for_status()
-    soup = BeautifulSoup(response.content, 'html.parser')
-    table = soup.find('table', id='tableStats')
-    if table:
-        df = pd.read_html(str(table), header=0, encoding='utf-8')[0]
-        df['type'] = type
-        return df
-    else:
-        print(f"Table with id='tableStats' not found.")
+pipeline = None
+archive = None
+replay_archive = None
+_shared = {}
+
+def fetch_content(url, city=None):
+    if replay_archive is not None:
+        try:
+            with metrics.timer('fetch'):
+                return replay_archive.fetch(url)
+        except LookupError as e:
+            print(e)
+            return None
+    with metrics.timer('fetch'):
+        content = pipeline.fetch(url)
+    if archive is not None:
+        archive.put(url, content, city)
+    return content
+
+def fetch_and_parse_data(url, type, city=None):
+    content = fetch_content(url, city)
+    if content is None:
         return None
+    return check_page(url, pipeline.process_content(content, url, type))
 
-def post_process_dataframe(df, report_date):
-    df = df.copy()
-    note_indicator = '*Забележка:'
-    df = df[~df[df.columns[0]].astype(str).str.contains(note_indicator, regex=False)]
-    df.drop(columns=['Unnamed: 0', 'Unnamed: 1', 'Unnamed: 4', 'Unnamed: 7', 'Unnamed: 10'], inplace=True)
-    df.columns = ['Region', '1_Bed_Price', '1_Bed_Price_Sqm', '2_Bed_Price', '2_Bed_Price_Sqm',
-                  '3_Bed_Price', '3_Bed_Price_Sqm', 'Avg_Price_Sqm']
-    for col in df.columns[1:]:
-        df[col] = df[col].str.replace(' ', '').replace('-', np.nan)
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-    df.dropna(how='all', inplace=True)
-    df['report_date'] = report_date
+def check_page(url, df):
+    if df is None:
+        print("Table with id='tableStats' not found.")
+        return None
+    if df.attrs['coerce_failures']:
+        print(f"{df.attrs['coerce_failures']} price cells could not be converted for {url}")
     return df
 
-def open_in_excel(file_name):
-    subprocess.run(["open", "-a", "Microsoft Excel", file_name])
-    script = '''
-        tell application "Microsoft Excel"
-            activate
-        end tell
-    '''
-    subprocess.run(["osascript", "-e", script])
+def read_manifest(path):
+    entries = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            parts = line.split(None, 1)
+            if len(parts) == 2:
+                entries.append((parts[0], parts[1]))
+            else:
+                entries.append((None, parts[0]))
+    return entries
+
+def expand_cities(cities, url_template, date_from, date_to, step_days):
+    start = datetime.strptime(date_from, '%Y-%m-%d')
+    end = datetime.strptime(date_to or date_from, '%Y-%m-%d')
+    entries = []
+    for city in cities:
+        day = start
+        while day <= end:
+            entries.append((city, url_template.format(city=city, date=day.strftime('%d.%m.%Y'))))
+            day += timedelta(days=step_days)
+    return entries
+
+def fetch_batch(entries, workers, per_host, skip=None, on_result=None, keep=True, parse_pool=None, chunk_size=8):
+    import threading
+    from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+    import requests
+
+    from cleaning import concat_frames
+
+    host_limits = {}
+    host_lock = threading.Lock()
+
+    def fetch_limited(city, url, type):
+        host = urlsplit(url).netloc
+        with host_lock:
+            limit = host_limits.setdefault(host, threading.BoundedSemaphore(per_host))
+        with limit:
+            # With a parse pool the threads only download, parsing happens in the workers
+            if parse_pool is not None:
+                return fetch_content(url, city)
+            return fetch_and_parse_data(url, type, city)
+
+    jobs = []
+    for city, base_url in entries:
+        for pn, type in enumerate(TYPES):
+            if skip is None or not skip(city, extract_date_from_url(base_url), type):
+                jobs.append((city, base_url, f"{base_url}&pn={pn}", type))
+
+    results = {}
+
+    def finish(i, df):
+        city, base_url, url, type = jobs[i]
+        if df is None:
+            return
+        df['city'] = city
+        if on_result is not None:
+            # on_result may swap the frame (e.g. for its changed rows) or drop it
+            df = on_result(city, extract_date_from_url(base_url), type, df)
+        if keep and df is not None:
+            results[i] = df
+
+    parsing = {}
+
+    def submit_chunk(chunk):
+        items = [(content, jobs[i][2], jobs[i][3]) for i, content in chunk]
+        parsing[parse_pool.submit(process_chunk, pipeline, items)] = [i for i, _ in chunk]
+
+    def collect(done):
+        for parsed in done:
+            indexes = parsing.pop(parsed)
+            columns_list, worker_metrics = parsed.result()
+            metrics.registry.merge(worker_metrics)
+            for i, columns in zip(indexes, columns_list):
+                finish(i, check_page(jobs[i][2], None if columns is None else frame_from_columns(columns)))
+
+    def abort():
+        # A page could not be handled (layout change, failing store, Ctrl-C):
+        # drop everything still queued instead of working through it first
+        for pending in list(futures) + list(parsing):
+            pending.cancel()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(fetch_limited, city, url, type): i for i, (city, _, url, type) in enumerate(jobs)}
+        chunk = []
+        try:
+            for future in as_completed(futures):
+                i = futures.pop(future)
+                try:
+                    result = future.result()
+                except requests.RequestException as e:
+                    print(f"Failed to fetch {jobs[i][2]}: {e}")
+                    continue
+                if parse_pool is None or result is None:
+                    finish(i, result)
+                    continue
+                chunk.append((i, result))
+                if len(chunk) >= chunk_size:
+                    submit_chunk(chunk)
+                    chunk = []
+                collect([parsed for parsed in parsing if parsed.done()])
+            if chunk:
+                submit_chunk(chunk)
+        except BaseException:
+            abort()
+            raise
+    try:
+        while parsing:
+            done, _ = wait(parsing, return_when=FIRST_COMPLETED)
+            collect(done)
+    except BaseException:
+        abort()
+        raise
+
+    # Keep the combined frame in manifest order regardless of completion order
+    frames = [results[i] for i in sorted(results)]
+    if not frames:
+        return None
+    return concat_frames(frames)
+
+def completion_log(store):
+    return CompletionLog(os.path.join(store, '_completed.jsonl'))
+
+def up_to_date(args, output_file_name):
+    # Past report dates never change: skip the run when everything it would
+    # produce already exists, without importing pandas or opening a connection
+    if args.force or args.stream or args.replay or not is_immutable(args.url):
+        return False
+    # Only the workbook and the store can be checked cheaply, anything else has to run
+    if args.index or args.aggregates or args.diff or args.archive or args.memory_report:
+        return False
+    if not args.no_xlsx and not os.path.exists(output_file_name):
+        return False
+    if args.store:
+        completed = completion_log(args.store)
+        city = args.city or args.output
+        report_date = extract_date_from_url(args.url)
+        return all(completed.is_done(city, report_date, type) for type in TYPES)
+    return True
 
 # Main execution
-if __name__ == "__main__":
-    base_url = args.url
-    report_date = extract_date_from_url(base_url)
-    
-    # Make two requests with different 'pn' values and 'type' values
-    sales_url = f"{base_url}&pn=0"
-    rent_url = f"{base_url}&pn=1"
+def validate(args):
+    if not (args.url or args.manifest or args.cities or args.replay):
+        parser.error('one of the arguments -l/--url -m/--manifest -c/--cities --replay is required')
+    if args.archive and args.replay:
+        parser.error('--archive and --replay cannot be combined')
+    if args.parse_workers is None:
+        args.parse_workers = os.cpu_count() if args.replay else 0
+    if args.cities and not (args.url_template and args.date_from):
+        parser.error('--cities requires --url-template and --date-from')
+    if args.diff and not args.store:
+        parser.error('--diff requires --store')
+    if args.incremental and not (args.store and not args.url):
+        parser.error('--incremental requires --store and a batch (--manifest or --cities)')
+    if args.float32 and not args.compact:
+        parser.error('--float32 requires --compact')
+
+def setup(args):
+    # Everything that should stay warm between runs: pandas, the pipeline, the
+    # connection pool, the request scheduler and the HTTP cache
+    global pipeline
+    import transport
+
+    from functools import partial
+    from importlib import import_module
 
-    sales_df = fetch_and_parse_data(sales_url, 'sales')
-    rent_df = fetch_and_parse_data(rent_url, 'rent')
+    import_module('pandas')
 
-    if sales_df is not None and rent_df is not None:
-        combined_df = pd.concat([sales_df, rent_df], ignore_index=True)
+    clean = partial(post_process_dataframe, legacy_layout=True) if args.legacy_layout else post_process_dataframe
+    pipeline = Pipeline(parse=parse_page_bs4 if args.parser == 'bs4' else parse_page, clean=clean, label='Bed')
+    transport.configure(pool_size=args.pool_size, read_timeout=args.timeout, retries=args.retries)
+    if args.rate:
+        from ratelimit import Scheduler
+        transport.set_scheduler(Scheduler(rate=args.rate, max_concurrency=args.per_host, shared_path=args.rate_file))
+    if args.cache_dir:
+        transport.set_cache(ResponseCache(args.cache_dir, args.cache_mb * 1024 * 1024))
 
+def shared(factory, path):
+    # Indexes and rollups opened once per path and reused by later runs
+    key = (factory, path)
+    if key not in _shared:
+        _shared[key] = factory(path)
+    return _shared[key]
+
+def run(args):
+    global archive, replay_archive
+    started = time.perf_counter()
+    # The registry lives as long as the process; a daemon job reports only its own run
+    recorded = metrics.registry.snapshot()
+    replay_archive = PageArchive(args.replay) if args.replay else None
+
+    if args.url:
+        report_date = extract_date_from_url(args.url)
         if report_date:
             output_file_name = f"{report_date} - {args.output}.xlsx"
         else:
             output_file_name = f"{args.output}.xlsx"
-        
-        writer = pd.ExcelWriter(output_file_name, engine='xlsxwriter')
-        combined_df.to_excel(writer, sheet_name='Sheet1', startrow=0, header=True, index=False)
-        workbook = writer.book
-        worksheet = writer.sheets['Sheet1']
-        header_format = workbook.add_format({
-            'bold': True,
-            'text_wrap': True,
-            'valign': 'top',
-            'fg_color': '#007ddf',  # blue
-            'font_color': '#FFFFFF',  # white
-            'border': 1})
-        accounting_format = workbook.add_format({'num_format': '€ #,##0.00', 'align': 'right'})
-        for col_num in range(1, len(combined_df.columns)):
-            worksheet.set_column(col_num, col_num, None, accounting_format)
-        worksheet.add_table(0, 0, len(combined_df), len(combined_df.columns) - 1, {
-            'columns': [{'header': col_name, 'header_format': header_format} for col_name in combined_df.columns],
-            'style': 'Table Style Medium 2'
-        })
-        writer.close()
+        if up_to_date(args, output_file_name):
+            print(f"{output_file_name} is up to date, use --force to scrape it again.")
+            return
+    else:
+        output_file_name = f"{args.output}.xlsx"
+        if args.manifest:
+            entries = read_manifest(args.manifest)
+        elif not args.cities:
+            entries = replay_archive.base_entries()
+        else:
+            entries = expand_cities(args.cities, args.url_template, args.date_from, args.date_to, args.step_days)
+        default_city = args.city or args.output
+        entries = [(city or default_city, base_url) for city, base_url in entries]
+
+        if args.incremental:
+            completed = completion_log(args.store)
+            if args.aggregates:
+                # A snapshot only counts as done once it has also reached the rollups
+                from aggregates import Aggregates
+                rollups = shared(Aggregates, args.aggregates)
+
+                def is_done(city, report_date, type):
+                    return completed.is_done(city, report_date, type) and (city, report_date, type) in rollups.ingested
+            else:
+                is_done = completed.is_done
+            entries = [(city, base_url) for city, base_url in entries
+                       if not all(is_done(city, extract_date_from_url(base_url), type) for type in TYPES)]
+            if not entries:
+                print('Nothing to fetch, every snapshot is already stored.')
+                return
+
+    from cleaning import compact_frame, concat_frames, memory_report
+    if args.store:
+        from storage import append_snapshot
+    if args.diff:
+        from diff import diff_against_store
+    aggregates = None
+    if args.aggregates:
+        from aggregates import Aggregates
+        aggregates = shared(Aggregates, args.aggregates)
+    price_index = None
+    if args.index:
+        from price_index import PriceIndex
+        price_index = shared(PriceIndex, args.index)
+
+    if pipeline is None:
+        setup(args)
+    archive = PageArchive(args.archive) if args.archive else None
+
+    sink = None
+    if args.stream:
+        from export import long_rows, open_sink
+        sink = open_sink(args.stream)
+
+    xlsx_sink = None
+    if not args.no_xlsx and (args.constant_memory or args.split_sheets):
+        from export import XlsxSink
+        xlsx_sink = XlsxSink(output_file_name, split_by=args.split_sheets)
+
+    handlers = []
+    if args.store:
+        if not args.incremental:
+            completed = completion_log(args.store)
+
+        def store_page(city, report_date, type, df):
+            with metrics.timer('store'):
+                append_snapshot(df, args.store, city)
+
+        handlers.append(store_page)
+    if price_index is not None:
+        def index_page(city, report_date, type, df):
+            with metrics.timer('index'):
+                price_index.add_frame(df, city)
+
+        handlers.append(index_page)
+    if aggregates is not None:
+        def aggregate_page(city, report_date, type, df):
+            with metrics.timer('aggregate'):
+                aggregates.ingest(df, city, report_date, type)
+
+        handlers.append(aggregate_page)
+
+    # Outputs get the changed rows instead of the whole table in --diff mode
+    outputs = []
+    if sink is not None:
+        def stream_page(city, report_date, type, df):
+            with metrics.timer('stream'):
+                sink.write(long_rows(df, city))
+
+        outputs.append(stream_page)
+    if xlsx_sink is not None:
+        def write_page(city, report_date, type, df):
+            with metrics.timer('write'):
+                xlsx_sink.write(df)
+
+        outputs.append(write_page)
+
+    def on_result(city, report_date, type, df):
+        if args.diff:
+            with metrics.timer('diff'):
+                previous_date, changes = diff_against_store(args.store, df, city, report_date, type)
+            if changes.empty:
+                print(f"{city} {type} {report_date or 'today'}: unchanged since {previous_date}")
+                # Still a data point for the rollups, and --incremental waits for them
+                if aggregates is not None:
+                    aggregate_page(city, report_date, type, df)
+                df = None
+            else:
+                changes['city'] = city
+        if df is not None:
+            for handler in handlers:
+                handler(city, report_date, type, df)
+            if args.diff:
+                df = changes
+            for handler in outputs:
+                handler(city, report_date, type, df)
+        # Current pages have no report date and are always re-fetched
+        if args.store and report_date:
+            completed.mark(city, report_date, type)
+        # Compacted per page, so the batch never holds the string-heavy frames at once
+        if args.compact and df is not None:
+            df = compact_frame(df, args.float32)
+        return df
+
+    # Pages are marked complete as they arrive, so whatever was written before
+    # an abort has to be flushed too
+    try:
+        if args.url:
+            base_url = args.url
+            city = args.city or args.output
+
+            # Make two requests with different 'pn' values and 'type' values
+            sales_url = f"{base_url}&pn=0"
+            rent_url = f"{base_url}&pn=1"
+
+            sales_df = fetch_and_parse_data(sales_url, 'sales', city)
+            rent_df = fetch_and_parse_data(rent_url, 'rent', city)
+
+            if sales_df is not None and rent_df is not None:
+                sales_df['city'] = city
+                rent_df['city'] = city
+                frames = [on_result(city, report_date, type, df) for type, df in (('sales', sales_df), ('rent', rent_df))]
+                frames = [df for df in frames if df is not None]
+                combined_df = concat_frames(frames) if frames else None
+            else:
+                combined_df = None
+        else:
+            # Frames are only kept when the pandas workbook or the memory
+            # report needs the whole batch
+            keep = (xlsx_sink is None and not args.no_xlsx) or args.memory_report
+            skip = is_done if args.incremental else None
+            if args.parse_workers:
+                from concurrent.futures import ProcessPoolExecutor
+
+                with ProcessPoolExecutor(max_workers=args.parse_workers) as parse_pool:
+                    combined_df = fetch_batch(entries, args.workers, args.per_host, skip=skip, on_result=on_result, keep=keep,
+                                              parse_pool=parse_pool, chunk_size=args.chunk_size)
+            else:
+                combined_df = fetch_batch(entries, args.workers, args.per_host, skip=skip, on_result=on_result, keep=keep)
+    finally:
+        if sink is not None:
+            sink.close()
+        if aggregates is not None:
+            aggregates.save()
+        if xlsx_sink is not None:
+            with metrics.timer('write'):
+                xlsx_sink.close()
+
+    if combined_df is not None:
+        if not args.no_xlsx and xlsx_sink is None:
+            pipeline.export(combined_df, output_file_name, table_style='Table Style Medium 2')
 
         print(combined_df)
 
-        if args.excel:
-            open_in_excel(output_file_name)
+        if args.memory_report:
+            print(memory_report(combined_df, args.float32).to_string())
+
+    if args.excel and not args.no_xlsx and (combined_df is not None or xlsx_sink is not None):
+        open_in_excel(output_file_name)
+
+    if args.timings:
+        summary = metrics.registry.summary(metrics.registry.since(recorded))
+        summary['wall_seconds'] = round(time.perf_counter() - started, 4)
+        if args.timings == '-':
+            print(json.dumps(summary, indent=2))
+        else:
+            with open(args.timings, 'w', encoding='utf-8') as f:
+                json.dump(summary, f, indent=2)
+
+def read_schedule(path):
+    import shlex
+
+    from daemon import ALIASES, CronSchedule
+
+    jobs = []
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = line.split(None, 1 if line.startswith('@') else 5)
+            cron_fields = 1 if fields[0] in ALIASES else 5
+            schedule = CronSchedule(' '.join(fields[:cron_fields]))
+            job_args = parser.parse_args(shlex.split(' '.join(fields[cron_fields:])))
+            ignored = [name for name in DAEMON_OPTIONS if getattr(job_args, name) != parser.get_default(name)]
+            if ignored:
+                parser.error(f"{path}:{number}: {', '.join('--' + name.replace('_', '-') for name in ignored)} "
+                             "can only be given on the daemon's own command line")
+            validate(job_args)
+            jobs.append((f'{number}:{job_args.city or job_args.output}', schedule, job_args))
+    return jobs
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    if args.daemon:
+        from daemon import Daemon
+
+        # Connection, scheduler and cache options come from the daemon's own
+        # command line; each schedule line only chooses what to scrape and where to write
+        jobs = read_schedule(args.daemon)
+        if not jobs:
+            parser.error(f'{args.daemon} lists no jobs')
+        setup(args)
+        print(f"Scheduled {len(jobs)} jobs" + (f", health on {args.health_host}:{args.health_port}" if args.health_port else ''))
+        Daemon(jobs, run, args.health_port, args.health_host).serve_forever()
+    else:
+        validate(args)
+        run(args)
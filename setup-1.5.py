@@ -0,0 +1,36 @@
+import glob
+import os
+import shutil
+import subprocess
+
+# Directory where the setup is to be done
+setup_dir = "/Users/bggidt01/Desktop/scraper"
+
+# The checkout this script lives in; the app and the shared pipeline modules
+# are copied from here instead of being embedded as strings
+source_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Check if the directory exists, create if it does not
+if not os.path.exists(setup_dir):
+    os.makedirs(setup_dir)
+
+# Navigate to the directory
+os.chdir(setup_dir)
+
+# Creating a virtual environment
+subprocess.run(["python3", "-m", "venv", "venv"])
+
+# Installing Flask and other required packages
+# Note: You might need to activate the virtual environment manually in some cases
+subprocess.run([f"{setup_dir}/venv/bin/pip", "install", "flask", "requests", "pandas", "beautifulsoup4", "lxml", "openpyxl", "xlsxwriter"])
+
+# Copying the Flask app, the CLI and the modules they share
+for path in glob.glob(os.path.join(source_dir, "*.py")):
+    if os.path.basename(path).startswith("setup-"):
+        continue
+    shutil.copy(path, setup_dir)
+
+# Copying the templates directory
+shutil.copytree(os.path.join(source_dir, "templates"), os.path.join(setup_dir, "templates"), dirs_exist_ok=True)
+
+print("Setup complete. You can now run 'app.py' in your Flask environment.")
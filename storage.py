@@ -0,0 +1,95 @@
+import os
+from datetime import date
+from urllib.parse import unquote
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+PARTITION_COLUMNS = ['city', 'report_date']
+DICTIONARY_COLUMNS = ['Region', 'type', 'city']
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError('The Parquet store requires pyarrow (pip install pyarrow).')
+
+# pandas picks int8 or int16 codes from the category count, which differs
+# between files; pin one index width so every file shares the same schema
+DICTIONARY_TYPE = pa.dictionary(pa.int32(), pa.string()) if pa is not None else None
+
+def _pin_dictionaries(schema):
+    return pa.schema([field.with_type(DICTIONARY_TYPE) if pa.types.is_dictionary(field.type) else field
+                      for field in schema], metadata=schema.metadata)
+
+def _partitioning():
+    return ds.partitioning(pa.schema([('city', pa.string()), ('report_date', pa.string())]), flavor='hive')
+
+def append_snapshot(df, root, city=None, report_date=None):
+    _require_pyarrow()
+    frame = df.copy()
+    if 'city' not in frame.columns:
+        frame['city'] = city
+    elif city is not None:
+        frame['city'] = frame['city'].fillna(city)
+    if 'report_date' not in frame.columns:
+        frame['report_date'] = report_date
+    # Current pages carry no &date=, they are stored under the day they were scraped
+    frame['report_date'] = frame['report_date'].fillna(date.today().isoformat())
+    frame['city'] = frame['city'].fillna('unknown')
+    for column in DICTIONARY_COLUMNS:
+        if column in frame.columns:
+            frame[column] = frame[column].astype('category')
+    # One file per type inside each (city, report_date) partition, named after
+    # the type, so re-storing a snapshot overwrites it instead of duplicating rows
+    if 'type' in frame.columns:
+        groups = frame.groupby('type', observed=True)
+    else:
+        groups = [('all', frame)]
+    for type, part in groups:
+        table = pa.Table.from_pandas(part, preserve_index=False)
+        table = table.cast(_pin_dictionaries(table.schema))
+        pq.write_to_dataset(table, root, partition_cols=PARTITION_COLUMNS,
+                            basename_template=f'{type}-{{i}}.parquet', existing_data_behavior='overwrite_or_ignore')
+
+def load_snapshots(root, columns=None, cities=None, date_from=None, date_to=None, types=None):
+    _require_pyarrow()
+    dataset = ds.dataset(root, format='parquet', partitioning=_partitioning())
+    # Stores written before the index width was pinned mix int8 and int16 codes
+    dataset = ds.dataset(root, format='parquet', partitioning=_partitioning(),
+                         schema=_pin_dictionaries(dataset.schema))
+    conditions = []
+    if cities:
+        conditions.append(ds.field('city').isin(list(cities)))
+    if date_from:
+        conditions.append(ds.field('report_date') >= date_from)
+    if date_to:
+        conditions.append(ds.field('report_date') <= date_to)
+    if types:
+        conditions.append(ds.field('type').isin(list(types)))
+    condition = None
+    for c in conditions:
+        condition = c if condition is None else condition & c
+    return dataset.to_table(columns=columns, filter=condition).to_pandas()
+
+def _partitions(directory, key):
+    # (value, path) per hive partition directory; pyarrow URI-encodes the
+    # values, e.g. city=Stara%20Zagora
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.startswith(f'{key}='):
+            yield unquote(name.split('=', 1)[1]), os.path.join(directory, name)
+
+def previous_report_date(root, city, type, before):
+    # Latest stored report date earlier than `before` holding a file for this type
+    dates = []
+    for value, city_dir in _partitions(root, 'city'):
+        if value != city:
+            continue
+        for report_date, date_dir in _partitions(city_dir, 'report_date'):
+            if report_date < before and any(f.startswith(f'{type}-') for f in os.listdir(date_dir)):
+                dates.append(report_date)
+    return max(dates) if dates else None
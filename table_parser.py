@@ -0,0 +1,127 @@
+import re
+from io import BytesIO, StringIO
+
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+_whitespace = re.compile(r'\s+')
+_hidden_style = re.compile(r'display:\s*none')
+_meta_charset = re.compile(rb'<meta[^>]+charset\s*=', re.I)
+_boms = (b'\xef\xbb\xbf', b'\xff\xfe', b'\xfe\xff')
+
+def declared_encoding(content):
+    # lxml only honours a BOM or a <meta> charset and guesses otherwise, so a
+    # page whose charset was only in the Content-Type header (which cache hits
+    # and replays no longer have) must be sniffed: UTF-8 if it decodes as such,
+    # None when the bytes alone cannot tell
+    if content.startswith(_boms) or _meta_charset.search(content[:65536]):
+        return 'declared'
+    try:
+        content.decode('utf-8')
+    except UnicodeDecodeError:
+        return None
+    return 'utf-8'
+
+def _hidden(el):
+    return bool(_hidden_style.search(el.get('style', '').replace(' ', '')))
+
+def _visible_text(el):
+    parts = [el.text or '']
+    for child in el:
+        if isinstance(child.tag, str) and not _hidden(child):
+            parts.append(_visible_text(child))
+        parts.append(child.tail or '')
+    return ''.join(parts)
+
+def _span(el, name):
+    try:
+        return max(1, int(el.get(name, 1)))
+    except ValueError:
+        return 1
+
+def iter_table_rows(content, table_id, encoding=None):
+    # Stream the document and stop as soon as the target table is closed,
+    # expanding colspan/rowspan the same way pd.read_html does
+    nested = 0
+    inside = False
+    row = []
+    footer = []
+    pending = {}
+    for event, el in etree.iterparse(BytesIO(content), events=('start', 'end'), html=True, recover=True, encoding=encoding):
+        if not inside:
+            if event == 'start' and el.tag == 'table' and el.get('id') == table_id:
+                inside = True
+            continue
+        if el.tag == 'table':
+            if event == 'start':
+                nested += 1
+                continue
+            if nested == 0:
+                break
+            nested -= 1
+            continue
+        if event != 'end' or nested:
+            continue
+        if el.tag in ('td', 'th'):
+            if not _hidden(el):
+                row.append((_whitespace.sub(' ', _visible_text(el)).strip(), _span(el, 'colspan'), _span(el, 'rowspan')))
+        elif el.tag == 'tr':
+            if not _hidden(el):
+                cells = []
+                col = 0
+                for text, colspan, rowspan in row:
+                    while col in pending:
+                        text_above, left = pending.pop(col)
+                        cells.append(text_above)
+                        if left > 1:
+                            pending[col] = (text_above, left - 1)
+                        col += 1
+                    for _ in range(colspan):
+                        cells.append(text)
+                        if rowspan > 1:
+                            pending[col] = (text, rowspan - 1)
+                        col += 1
+                for col in sorted(c for c in pending if c >= len(cells)):
+                    text_above, left = pending.pop(col)
+                    cells.append(text_above)
+                    if left > 1:
+                        pending[col] = (text_above, left - 1)
+                section = next(el.iterancestors('tfoot', 'table'), None)
+                if section is not None and section.tag == 'tfoot':
+                    footer.append(cells)
+                else:
+                    yield cells
+            row = []
+            el.clear()
+    yield from footer
+
+def parse_table(content, table_id='tableStats'):
+    encoding = declared_encoding(content)
+    if etree is None or encoding is None:
+        # BeautifulSoup detects the charset from the bytes themselves
+        return parse_table_bs4(content, table_id)
+    try:
+        rows = list(iter_table_rows(content, table_id, None if encoding == 'declared' else encoding))
+    except etree.LxmlError:
+        return parse_table_bs4(content, table_id)
+    if not rows:
+        return None
+    width = max(len(r) for r in rows)
+    for r in rows:
+        r.extend([''] * (width - len(r)))
+    with TextParser(rows, header=0) as tp:
+        return tp.read()
+
+def parse_table_bs4(content, table_id='tableStats'):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(content, 'html.parser')
+    table = soup.find('table', id=table_id)
+    if table:
+        return pd.read_html(StringIO(str(table)), header=0)[0]
+    return None
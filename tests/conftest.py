@@ -0,0 +1,51 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
+
+import transport
+from stub_server import StubServer
+
+DATES = ['01.02.2023', '02.02.2023', '03.02.2023']
+
+# A tableStats table without any of the expected columns
+BROKEN_PAGE = b'<html><table id="tableStats"><tr><th>X</th><th>Y</th></tr><tr><td>a</td><td>1</td></tr></table></html>'
+
+@pytest.fixture
+def stub():
+    with StubServer() as server:
+        yield server
+
+def page_url(stub, date):
+    return f'{stub.url}/pcgi/imot.cgi?act=14&date={date}'
+
+@pytest.fixture
+def manifest(stub, tmp_path):
+    path = tmp_path / 'manifest.txt'
+    path.write_text(''.join(f'sofia {page_url(stub, date)}\n' for date in DATES), encoding='utf-8')
+    return str(path)
+
+@pytest.fixture
+def scraper(monkeypatch, tmp_path):
+    # A fresh module per test: the CLI keeps its pipeline and shared indexes in globals
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(transport, 'scheduler', None)
+    monkeypatch.setattr(transport, 'cache', None)
+    spec = importlib.util.spec_from_file_location('scraper', os.path.join(ROOT, 'scraper-1.7.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.fixture
+def cli(scraper):
+    def run(*argv):
+        args = scraper.parser.parse_args([*argv, '--rate', '0', '-w', '1'])
+        scraper.validate(args)
+        scraper.run(args)
+        return args
+
+    return run
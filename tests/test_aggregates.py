@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+from aggregates import Aggregates
+
+def snapshot(report_date, type, price_sqm):
+    return pd.DataFrame({'Region': ['Лозенец'], '1_Bed_Price_Sqm': [price_sqm], 'report_date': report_date, 'type': type})
+
+@pytest.fixture
+def rollups():
+    rollups = Aggregates()
+    # Sales for Jan-Mar 2023 and Mar 2024, with the 12 months between missing
+    for report_date, price in [('2023-01-01', 1000.0), ('2023-02-01', 1100.0), ('2023-03-01', 1210.0), ('2024-03-01', 1452.0)]:
+        rollups.ingest(snapshot(report_date, 'sales', price), 'sofia')
+    rollups.ingest(snapshot('2023-03-01', 'rent', 10.0), 'sofia')
+    return rollups
+
+def test_trend_month_over_month(rollups):
+    trend = rollups.trend('sofia', 'Лозенец', 'sales', '1', month='2023-03')
+    assert trend['mean'] == 1210.0
+    assert trend['mom_pct'] == pytest.approx(10.0)
+    assert trend['yoy_pct'] is None
+    assert trend['rolling_mean'] == pytest.approx((1000 + 1100 + 1210) / 3)
+
+def test_trend_across_a_gap(rollups):
+    trend = rollups.trend('sofia', 'Лозенец', 'sales', '1')
+    assert trend['month'] == '2024-03'
+    assert trend['yoy_pct'] == pytest.approx(20.0)
+    # Feb 2024 is missing, and so are the other months of the window
+    assert trend['mom_pct'] is None
+    assert trend['rolling_mean'] == 1452.0
+
+def test_rental_yield(rollups):
+    assert rollups.rental_yield('sofia', 'Лозенец', '1', month='2023-03')['yield_pct'] == pytest.approx(10 * 12 / 1210 * 100)
+    assert rollups.rental_yield('sofia', 'Лозенец', '1') is None
+
+def test_reingesting_a_snapshot_is_a_no_op(rollups):
+    assert rollups.ingest(snapshot('2023-02-01', 'sales', 5000.0), 'sofia') == 0
+    assert dict(rollups.series('sofia', 'Лозенец', 'sales', '1'))['2023-02'] == 1100.0
+
+def test_snapshots_before_the_epoch_are_rejected(rollups):
+    with pytest.raises(ValueError):
+        rollups.ingest(snapshot('1999-06-01', 'sales', 900.0), 'sofia')
+    assert [month for month, _ in rollups.series('sofia', 'Лозенец', 'sales', '1')] == ['2023-01', '2023-02', '2023-03', '2024-03']
+
+def test_save_and_load_round_trip(rollups, tmp_path):
+    rollups.directory = str(tmp_path)
+    rollups.save()
+    loaded = Aggregates(str(tmp_path))
+    assert loaded.series('sofia', 'Лозенец', 'sales', '1') == rollups.series('sofia', 'Лозенец', 'sales', '1')
+    assert loaded.ingested == rollups.ingested
+    assert loaded.trend('sofia', 'Лозенец', 'sales', '1') == rollups.trend('sofia', 'Лозенец', 'sales', '1')
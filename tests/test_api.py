@@ -0,0 +1,44 @@
+import pytest
+
+from conftest import DATES
+from price_index import PriceIndex
+
+@pytest.fixture
+def client(cli, manifest, monkeypatch, tmp_path):
+    import app
+
+    cli('-m', manifest, '--index', 'prices.db', '--aggregates', 'rollups', '--no-xlsx')
+    monkeypatch.setattr(app, 'price_index', PriceIndex(str(tmp_path / 'prices.db')))
+    monkeypatch.setattr(app, 'aggregates_dir', str(tmp_path / 'rollups'))
+    monkeypatch.setattr(app, 'aggregates', {'mtime': None, 'rollups': None})
+    app.api_responses.clear()
+    return app.app.test_client()
+
+def test_prices_are_filtered(client):
+    rows = client.get('/api/prices?city=sofia&type=rent&rooms=1&metric=price').json['rows']
+    # Some 1-room prices are '-' on the page and not indexed
+    assert 0 < len(rows) <= len(DATES) * 60
+    assert {(row['city'], row['type'], row['rooms'], row['metric']) for row in rows} == {('sofia', 'rent', '1', 'price')}
+
+@pytest.mark.parametrize('limit, count', [('3', 3), ('0', 1), ('-5', 1)])
+def test_prices_limit_is_clamped(client, limit, count):
+    assert client.get(f'/api/prices?limit={limit}').json['count'] == count
+
+def test_prices_revalidate_with_etag(client):
+    etag = client.get('/api/prices?region=Район 1').headers['ETag']
+    assert client.get('/api/prices?region=Район 1', headers={'If-None-Match': etag}).status_code == 304
+
+def test_trends(client):
+    body = client.get('/api/trends?city=sofia&region=Район 1&rooms=1').json
+    assert body['trend']['month'] == '2023-02'
+    assert body['yield']['yield_pct'] > 0
+    assert body['series'] is None
+
+def test_trends_series_is_not_served_from_the_plain_response(client):
+    client.get('/api/trends?city=sofia&region=Район 1&rooms=1')
+    series = client.get('/api/trends?city=sofia&region=Район 1&rooms=1&series').json['series']
+    assert series and series[0][0] == '2023-02'
+
+@pytest.mark.parametrize('query', ['month=2024', 'month=2023-13', 'month=2023-2', 'window=0', 'window=-1'])
+def test_trends_rejects_bad_parameters(client, query):
+    assert client.get(f'/api/trends?city=sofia&region=Район 1&rooms=1&{query}').status_code == 400
@@ -0,0 +1,93 @@
+import time
+
+import pytest
+
+import transport
+from conftest import DATES, page_url
+from jobs import JobQueue
+from result_cache import ResultCache
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    import app
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(transport, 'scheduler', None)
+    monkeypatch.setattr(transport, 'cache', None)
+    monkeypatch.setattr(app, 'result_cache', ResultCache())
+    monkeypatch.setattr(app, 'job_queue', JobQueue(max_workers=2))
+    return app
+
+@pytest.fixture
+def client(app):
+    return app.app.test_client()
+
+def wait_for(client, job):
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        status = client.get(job['status_url']).json
+        if status['status'] in ('finished', 'failed'):
+            return status
+        time.sleep(0.02)
+    raise AssertionError(f'{job} did not finish')
+
+def test_job_queue_records_results_and_failures():
+    queue = JobQueue(max_workers=1)
+    ok = queue.submit(lambda x: x * 2, 21)
+    failed = queue.submit(lambda: 1 / 0)
+    deadline = time.monotonic() + 5
+    while queue.status(failed)['status'] != 'failed' and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert queue.get(ok)['result'] == 42
+    assert queue.status(ok)['status'] == 'finished'
+    assert 'result' not in queue.status(ok)
+    assert queue.status(failed)['error'] == 'division by zero'
+    assert queue.status('unknown') is None
+
+def test_job_queue_forgets_the_oldest_finished_jobs():
+    queue = JobQueue(max_workers=1, max_jobs=3)
+    ids = [queue.submit(lambda: None) for _ in range(3)]
+    deadline = time.monotonic() + 5
+    while queue.status(ids[-1])['status'] != 'finished' and time.monotonic() < deadline:
+        time.sleep(0.01)
+    queue.submit(lambda: None)
+    assert queue.get(ids[0]) is None
+    assert queue.get(ids[1]) is not None
+
+def test_submit_queues_a_job(client, stub):
+    response = client.post('/submit', data={'url': page_url(stub, DATES[0]), 'output': 'sofia'})
+    assert response.status_code == 202
+    job = response.json
+    assert job['status_url'] == f"/jobs/{job['job_id']}"
+    assert wait_for(client, job)['status'] == 'finished'
+
+def test_failed_jobs_report_their_error(client, stub):
+    stub.set_page(DATES[0], 'sales', b'<html><body>maintenance</body></html>')
+    job = client.post('/submit', data={'url': page_url(stub, DATES[0]) + '&pn=0', 'output': 'sofia'}).json
+    status = wait_for(client, job)
+    assert status['status'] == 'failed'
+    assert 'tableStats' in status['error']
+    assert client.get(job['result_url']).status_code == 409
+
+def test_unknown_jobs(client):
+    assert client.get('/jobs/nope').status_code == 404
+    assert client.get('/jobs/nope/result').status_code == 404
+
+def test_form_polls_the_job(client):
+    page = client.get('/').get_data(as_text=True)
+    assert 'status_url' in page and 'result_url' in page
+
+def test_result_is_streamed_from_memory(client, stub, tmp_path):
+    from io import BytesIO
+
+    import pandas as pd
+
+    job = client.post('/submit', data={'url': page_url(stub, DATES[0]), 'output': 'sofia'}).json
+    wait_for(client, job)
+    response = client.get(job['result_url'])
+    assert response.status_code == 200
+    assert response.mimetype == 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    assert 'filename="2023-02-01 - sofia.xlsx"' in response.headers['Content-Disposition']
+    workbook = pd.read_excel(BytesIO(response.data))
+    assert len(workbook) == 60 and workbook.columns[0] == 'Region'
+    assert list(tmp_path.iterdir()) == []
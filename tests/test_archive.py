@@ -0,0 +1,21 @@
+import pandas as pd
+
+from archive import PageArchive
+
+def test_archive_keeps_one_blob_per_distinct_page(tmp_path):
+    archive = PageArchive(str(tmp_path / 'archive'))
+    archive.put('http://imot.test/a&pn=0', b'page', 'sofia')
+    archive.put('http://imot.test/a&pn=0', b'page', 'sofia')
+    archive.put('http://imot.test/a&pn=1', b'other', 'sofia')
+    blobs = [path for path in (tmp_path / 'archive' / 'blobs').rglob('*') if path.is_file()]
+    assert len(blobs) == 2
+    assert PageArchive(str(tmp_path / 'archive')).fetch('http://imot.test/a&pn=1') == b'other'
+    assert archive.base_entries() == [('sofia', 'http://imot.test/a')]
+
+def test_replay_rebuilds_the_workbook_offline(cli, stub, manifest):
+    cli('-m', manifest, '--archive', 'archive', '-o', 'live')
+    requests = stub.requests
+    stub.stop()
+    cli('--replay', 'archive', '-o', 'replayed')
+    assert stub.requests == requests
+    pd.testing.assert_frame_equal(pd.read_excel('replayed.xlsx'), pd.read_excel('live.xlsx'))
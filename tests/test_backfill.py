@@ -0,0 +1,33 @@
+from backfill import CompletionLog
+
+def test_completion_log_survives_a_torn_last_line(tmp_path):
+    path = str(tmp_path / 'store' / '_completed.jsonl')
+    log = CompletionLog(path)
+    log.mark('sofia', '2023-02-01', 'sales')
+    log.mark('sofia', '2023-02-01', 'sales')
+    log.mark('София', '2023-02-01', 'rent')
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('["sofia", "2023-02-02"')
+    reopened = CompletionLog(path)
+    assert reopened.completed == {('sofia', '2023-02-01', 'sales'), ('София', '2023-02-01', 'rent')}
+    with open(path, encoding='utf-8') as f:
+        assert len(f.readlines()) == 3
+
+def test_incremental_skips_stored_snapshots(cli, stub, manifest, capsys):
+    cli('-m', manifest, '--store', 'store', '--no-xlsx', '--incremental')
+    requests = stub.requests
+    cli('-m', manifest, '--store', 'store', '--no-xlsx', '--incremental')
+    assert stub.requests == requests
+    assert 'Nothing to fetch' in capsys.readouterr().out
+
+def test_incremental_fetches_only_missing_snapshots(cli, stub, manifest):
+    cli('-m', manifest, '--store', 'store', '--no-xlsx', '--incremental')
+    log = CompletionLog('store/_completed.jsonl')
+    log.completed.discard(('sofia', '2023-02-02', 'rent'))
+    with open('store/_completed.jsonl', 'w', encoding='utf-8') as f:
+        f.writelines(f'["{city}", "{date}", "{type}"]\n' for city, date, type in sorted(log.completed))
+    requests = stub.requests
+    cli('-m', manifest, '--store', 'store', '--no-xlsx', '--incremental')
+    # Only the missing type of that date, not its stored sales page
+    assert stub.requests - requests == 1
+    assert CompletionLog('store/_completed.jsonl').is_done('sofia', '2023-02-02', 'rent')
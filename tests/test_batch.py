@@ -0,0 +1,88 @@
+import json
+import os
+
+import pytest
+
+from aggregates import Aggregates
+from backfill import CompletionLog
+from conftest import BROKEN_PAGE, DATES, page_url
+from price_index import PriceIndex
+from schema import SchemaError
+from storage import load_snapshots
+
+def completed(store):
+    return CompletionLog(os.path.join(store, '_completed.jsonl'))
+
+def test_batch_stores_every_snapshot(cli, stub, manifest):
+    cli('-m', manifest, '--store', 'store', '--no-xlsx')
+    assert stub.requests == 6
+    stored = load_snapshots('store')
+    assert sorted(stored['report_date'].unique()) == ['2023-02-01', '2023-02-02', '2023-02-03']
+    assert sorted(stored['type'].unique()) == ['rent', 'sales']
+    assert len(stored) == 6 * 60
+
+def test_incremental_refetches_snapshots_missing_from_rollups(cli, stub, manifest):
+    cli('-m', manifest, '--store', 'store', '--no-xlsx')
+    cli('-m', manifest, '--store', 'store', '--aggregates', 'rollups', '--no-xlsx', '--incremental')
+    assert stub.requests == 12
+    assert len(Aggregates('rollups').ingested) == 6
+
+def test_abort_keeps_rollups_of_completed_pages(cli, stub, manifest):
+    stub.set_page(DATES[2], 'sales', BROKEN_PAGE)
+    with pytest.raises(SchemaError):
+        cli('-m', manifest, '--store', 'store', '--aggregates', 'rollups', '--no-xlsx', '--incremental')
+    log = completed('store')
+    done = {(city, date, type) for city in ['sofia'] for date in ['2023-02-01', '2023-02-02'] for type in ['sales', 'rent']}
+    assert all(log.is_done(*snapshot) for snapshot in done)
+    assert Aggregates('rollups').ingested == done
+
+    stub.set_page(DATES[2], 'sales', stub.page(DATES[1], 'sales'))
+    requests = stub.requests
+    cli('-m', manifest, '--store', 'store', '--aggregates', 'rollups', '--no-xlsx', '--incremental')
+    assert stub.requests - requests == 2
+    assert len(Aggregates('rollups').ingested) == 6
+
+def test_single_url_archives_the_city(cli, stub):
+    cli('-l', page_url(stub, DATES[0]), '--city', 'varna', '--archive', 'pages', '--no-xlsx')
+    with open(os.path.join('pages', 'index.ndjson'), encoding='utf-8') as f:
+        entries = [json.loads(line) for line in f]
+    assert len(entries) == 2
+    assert {entry['city'] for entry in entries} == {'varna'}
+
+def test_up_to_date_workbook_still_fills_the_index(cli, stub, capsys):
+    url = page_url(stub, DATES[0])
+    cli('-l', url, '-o', 'sofia')
+    cli('-l', url, '-o', 'sofia')
+    assert 'is up to date' in capsys.readouterr().out
+    cli('-l', url, '-o', 'sofia', '--index', 'prices.db')
+    assert PriceIndex('prices.db').query(limit=1)
+
+def test_up_to_date_workbook_still_prints_the_memory_report(cli, stub, capsys):
+    url = page_url(stub, DATES[0])
+    cli('-l', url, '-o', 'sofia')
+    capsys.readouterr()
+    cli('-l', url, '-o', 'sofia', '--compact', '--memory-report')
+    out = capsys.readouterr().out
+    assert 'is up to date' not in out
+    assert 'legacy_bytes' in out
+
+@pytest.mark.parametrize('parse_workers', ['0', '2'])
+def test_failing_handler_cancels_queued_pages(cli, stub, tmp_path, monkeypatch, parse_workers):
+    import storage
+
+    def fail(*args, **kwargs):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(storage, 'append_snapshot', fail)
+    # Slow enough that the parse workers report back long before the manifest is fetched
+    stub.latency = 0.05
+    dates = [f'{day:02d}.01.2023' for day in range(1, 21)]
+    (tmp_path / 'many.txt').write_text(''.join(f'sofia {page_url(stub, date)}\n' for date in dates), encoding='utf-8')
+    with pytest.raises(OSError):
+        cli('-m', 'many.txt', '--store', 'store', '--no-xlsx', '--parse-workers', parse_workers, '--chunk-size', '1')
+    assert stub.requests < 20
+
+def test_memory_report_without_a_workbook(cli, stub, manifest, capsys):
+    cli('-m', manifest, '--compact', '--memory-report', '--no-xlsx')
+    out = capsys.readouterr().out
+    assert 'legacy_bytes' in out and 'total' in out
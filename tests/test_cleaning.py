@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from cleaning import clean_prices, compact_frame, concat_frames, memory_report, note_rows
+from fixtures import synthetic_page
+from pipeline import Pipeline
+
+def test_clean_prices_parses_separators_and_counts_failures():
+    df = pd.DataFrame({
+        'Region': ['A', 'B', 'C', None],
+        'Price': ['12 345', '1\xa0000', '-', None],
+        'Price_Sqm': ['1 500', 'n/a', '', None],
+    })
+    cleaned, failures = clean_prices(df, ['Price', 'Price_Sqm'])
+    assert failures == 1
+    assert list(cleaned['Region']) == ['A', 'B', 'C']
+    np.testing.assert_array_equal(cleaned['Price'], [12345, 1000, np.nan])
+    np.testing.assert_array_equal(cleaned['Price_Sqm'], [1500, np.nan, np.nan])
+    assert cleaned['Price'].dtype == 'float64'
+
+def test_failures_in_dropped_rows_are_not_counted():
+    df = pd.DataFrame({'Price': ['x', '1'], 'Price_Sqm': [None, '2']})
+    cleaned, failures = clean_prices(df, ['Price', 'Price_Sqm'])
+    assert list(cleaned.index) == [1]
+    assert failures == 0
+
+def test_note_rows():
+    column = pd.Series(['Район 1', '*Забележка: цени в евро', None, 5])
+    assert list(note_rows(column)) == [False, True, False, False]
+
+def test_pipeline_reports_coerce_failures():
+    page = synthetic_page().replace('<td>Район 3</td><td></td><td>'.encode(), '<td>Район 3</td><td></td><td>около '.encode())
+    df = Pipeline(label='Bed').process_content(page, 'x?a=1&date=01.02.2023', 'sales')
+    assert df.attrs['coerce_failures'] == 1
+    assert np.isnan(df.loc[df['Region'] == 'Район 3', '1_Bed_Price']).all()
+    assert set(df['report_date']) == {'2023-02-01'}
+
+def snapshot(regions, type):
+    return pd.DataFrame({'Region': regions, '1_Bed_Price': 100.0, 'report_date': '2023-02-01', 'type': type, 'city': 'sofia'})
+
+def test_compact_frame_dtypes():
+    df = compact_frame(snapshot(['A', 'B'], 'sales'), float32=True)
+    assert all(isinstance(df[c].dtype, pd.CategoricalDtype) for c in ['Region', 'type', 'city'])
+    assert pd.api.types.is_datetime64_any_dtype(df['report_date'])
+    assert df['1_Bed_Price'].dtype == 'float32'
+
+def test_concat_frames_keeps_categoricals_with_different_categories():
+    frames = [compact_frame(snapshot(['A', 'B'], 'sales')), compact_frame(snapshot(['B', 'C'], 'rent'))]
+    combined = concat_frames(frames)
+    assert isinstance(combined['Region'].dtype, pd.CategoricalDtype)
+    assert list(combined['Region']) == ['A', 'B', 'B', 'C']
+    assert list(combined['type']) == ['sales', 'sales', 'rent', 'rent']
+
+def test_memory_report_compares_both_layouts():
+    df = compact_frame(snapshot([f'Район {i}' for i in range(200)], 'sales'))
+    report = memory_report(df, float32=True)
+    assert list(report.columns) == ['legacy_bytes', 'compact_bytes', 'ratio']
+    assert report.loc['total', 'legacy_bytes'] == report['legacy_bytes'].drop('total').sum()
+    assert report.loc['Region', 'legacy_bytes'] > report.loc['Region', 'compact_bytes']
+    assert report.loc['1_Bed_Price', 'ratio'] == 2
@@ -0,0 +1,79 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from daemon import CronSchedule, parse_field
+
+def next_runs(expression, start, count=3):
+    schedule = CronSchedule(expression)
+    runs = []
+    moment = datetime.fromisoformat(start)
+    for _ in range(count):
+        moment = schedule.next_after(moment)
+        runs.append(moment.isoformat(timespec='minutes'))
+    return runs
+
+def test_fields():
+    assert parse_field('*/15', 0, 59) == {0, 15, 30, 45}
+    assert parse_field('1-5,10', 1, 31) == {1, 2, 3, 4, 5, 10}
+    assert parse_field('7', 0, 6) == {0}
+    assert parse_field('5-7', 0, 6) == {5, 6, 0}
+
+@pytest.mark.parametrize('text, low, high', [('60', 0, 59), ('0', 1, 31), ('9', 0, 6), ('5-9', 0, 6), ('*/0', 0, 59), ('5-1', 0, 23)])
+def test_out_of_range_fields_are_rejected(text, low, high):
+    with pytest.raises(ValueError):
+        parse_field(text, low, high)
+
+def test_next_after():
+    assert next_runs('30 3 * * *', '2024-01-31T04:00') == ['2024-02-01T03:30', '2024-02-02T03:30', '2024-02-03T03:30']
+    assert next_runs('@monthly', '2024-01-15T00:00') == ['2024-02-01T00:00', '2024-03-01T00:00', '2024-04-01T00:00']
+    assert next_runs('0 12 29 2 *', '2023-03-01T00:00', 1) == ['2024-02-29T12:00']
+    # Sunday as 0 or 7
+    assert next_runs('0 0 * * 7', '2024-01-01T00:00', 1) == next_runs('0 0 * * 0', '2024-01-01T00:00', 1) == ['2024-01-07T00:00']
+
+def test_day_of_month_or_day_of_week():
+    # 2024-01-01 is a Monday: fires on the 15th and on every Monday
+    assert next_runs('0 0 15 * 1', '2024-01-01T00:00', 3) == ['2024-01-08T00:00', '2024-01-15T00:00', '2024-01-22T00:00']
+
+def test_invalid_expressions():
+    with pytest.raises(ValueError):
+        CronSchedule('0 3 * *')
+    with pytest.raises(ValueError, match='never fires'):
+        CronSchedule('0 0 31 2 *').next_after(datetime(2024, 1, 1))
+
+def test_health_server_listens_on_localhost():
+    from urllib.request import urlopen
+
+    from daemon import Daemon
+
+    daemon = Daemon([('1:sofia', CronSchedule('@daily'), None)], lambda payload: None, health_port=0)
+    daemon._start_health_server()
+    try:
+        host, port = daemon._server.server_address[:2]
+        assert host == '127.0.0.1'
+        with urlopen(f'http://{host}:{port}/health') as response:
+            assert json.load(response)['jobs']['1:sofia']['schedule'] == '@daily'
+    finally:
+        daemon._server.shutdown()
+        daemon._server.server_close()
+
+@pytest.mark.parametrize('option', ['--rate 2', '--cache-dir cache', '--parser bs4', '--timeout 5', '--pool-size 2'])
+def test_schedule_rejects_daemon_options(scraper, tmp_path, option, capsys):
+    (tmp_path / 'schedule.txt').write_text(f'@daily -m manifest.txt {option}\n', encoding='utf-8')
+    with pytest.raises(SystemExit):
+        scraper.read_schedule('schedule.txt')
+    assert option.split()[0] in capsys.readouterr().err
+
+def test_schedule_lines(scraper, tmp_path):
+    (tmp_path / 'schedule.txt').write_text('# nightly\n30 3 * * * -m manifest.txt --store store --per-host 2\n'
+                                           '@hourly -l "http://imot.test/x?a=1" --city varna\n', encoding='utf-8')
+    jobs = scraper.read_schedule('schedule.txt')
+    assert [(name, schedule.expression) for name, schedule, _ in jobs] == [('2:scrape', '30 3 * * *'), ('3:varna', '@hourly')]
+    assert jobs[0][2].per_host == 2
+
+def test_timings_cover_only_the_current_run(cli, stub, manifest):
+    for _ in range(2):
+        cli('-m', manifest, '--no-xlsx', '--force', '--timings', 'timings.json')
+        with open('timings.json', encoding='utf-8') as f:
+            assert json.load(f)['stages']['fetch']['count'] == 6
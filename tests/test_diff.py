@@ -0,0 +1,37 @@
+import pandas as pd
+import pytest
+
+from conftest import DATES, page_url
+
+@pytest.mark.parametrize('city', ['sofia', 'София', 'Stara Zagora'])
+def test_diff_outputs_only_changed_regions(cli, stub, tmp_path, capsys, city):
+    first, second = DATES[:2]
+    (tmp_path / 'first.txt').write_text(f'{page_url(stub, first)}\n', encoding='utf-8')
+    (tmp_path / 'second.txt').write_text(f'{page_url(stub, second)}\n', encoding='utf-8')
+    cli('-m', 'first.txt', '--city', city, '--store', 'store', '--no-xlsx')
+
+    stub.set_page(second, 'sales', stub.page(first, 'sales').replace('Район 5<'.encode(), 'Район 5а<'.encode()))
+    stub.set_page(second, 'rent', stub.page(first, 'rent'))
+    cli('-m', 'second.txt', '--city', city, '--store', 'store', '-o', 'changes', '--diff')
+    assert f'{city} rent 2023-02-02: unchanged since 2023-02-01' in capsys.readouterr().out
+    changes = pd.read_excel('changes.xlsx')
+    assert sorted(zip(changes['Region'], changes['Change'])) == [('Район 5', 'removed'), ('Район 5а', 'added')]
+    assert set(changes['type']) == {'sales'}
+    assert set(changes['previous_date']) == {'2023-02-01'}
+
+def test_unchanged_pages_still_reach_the_rollups(cli, stub, tmp_path, capsys):
+    first, second = DATES[:2]
+    (tmp_path / 'first.txt').write_text(f'{page_url(stub, first)}\n', encoding='utf-8')
+    (tmp_path / 'second.txt').write_text(f'{page_url(stub, second)}\n', encoding='utf-8')
+    cli('-m', 'first.txt', '--city', 'sofia', '--store', 'store', '--no-xlsx')
+
+    for type in ('sales', 'rent'):
+        stub.set_page(second, type, stub.page(first, type))
+    args = ('-m', 'second.txt', '--city', 'sofia', '--store', 'store', '--no-xlsx', '--diff', '--aggregates', 'rollups', '--incremental')
+    cli(*args)
+    assert 'sofia rent 2023-02-02: unchanged since 2023-02-01' in capsys.readouterr().out
+    requests = stub.requests
+    # A no-op rerun must not fetch the unchanged snapshots again
+    cli(*args)
+    assert stub.requests == requests
+    assert 'Nothing to fetch' in capsys.readouterr().out
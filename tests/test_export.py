@@ -0,0 +1,98 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from conftest import BROKEN_PAGE, DATES, page_url
+from export import LONG_COLUMNS, XlsxSink, long_rows, melt_columns, open_sink
+from schema import SchemaError
+
+FRAME = pd.DataFrame({
+    'Region': ['Лозенец', 'Център'],
+    '1_Bed_Price': [100000.0, np.nan],
+    '1_Bed_Price_Sqm': [2000.0, 2100.0],
+    'Avg_Price_Sqm': [1900.0, 2200.0],
+    'report_date': '2023-02-01',
+    'type': 'sales',
+})
+
+def test_melt_columns():
+    assert melt_columns(['Region', '2_Bed_Price_Sqm', '3_Room_Price', 'Avg_Price_Sqm', 'report_date']) == {
+        '2_Bed_Price_Sqm': ('2', 'price_sqm'), '3_Room_Price': ('3', 'price'), 'Avg_Price_Sqm': ('all', 'price_sqm')}
+
+def test_long_rows_skip_missing_prices():
+    rows = list(long_rows(FRAME, 'sofia'))
+    assert len(rows) == 5
+    assert rows[0] == ('sofia', '2023-02-01', 'sales', 'Лозенец', '1', 'price', 100000.0)
+    assert ('sofia', '2023-02-01', 'sales', 'Център', '1', 'price', 2100.0) not in rows
+
+@pytest.mark.parametrize('extension', ['.csv', '.ndjson', '.parquet'])
+def test_sinks_write_every_page(tmp_path, extension):
+    path = str(tmp_path / f'rows{extension}')
+    sink = open_sink(path)
+    sink.write(long_rows(FRAME, 'sofia'))
+    sink.write(iter(()))
+    sink.write(long_rows(FRAME.assign(type='rent'), 'sofia'))
+    sink.close()
+    if extension == '.csv':
+        rows = pd.read_csv(path)
+    elif extension == '.ndjson':
+        with open(path, encoding='utf-8') as f:
+            rows = pd.DataFrame([json.loads(line) for line in f])
+    else:
+        rows = pq.read_table(path).to_pandas()
+        assert pq.ParquetFile(path).num_row_groups == 2
+    assert list(rows.columns) == LONG_COLUMNS
+    assert len(rows) == 10
+    assert rows['region'].iloc[0] == 'Лозенец'
+
+def test_unknown_stream_format(tmp_path):
+    with pytest.raises(ValueError, match='Unsupported stream format'):
+        open_sink(str(tmp_path / 'rows.xml'))
+
+def test_abort_closes_the_stream(cli, stub, manifest):
+    stub.set_page(DATES[2], 'sales', BROKEN_PAGE)
+    with pytest.raises(SchemaError):
+        cli('-m', manifest, '--stream', 'rows.csv', '--no-xlsx')
+    rows = pd.read_csv('rows.csv')
+    assert sorted(rows['report_date'].unique()) == ['2023-02-01', '2023-02-02']
+
+def test_xlsx_sink_writes_missing_prices_as_empty_cells(tmp_path):
+    path = str(tmp_path / 'out.xlsx')
+    sink = XlsxSink(path)
+    sink.write(FRAME)
+    sink.close()
+    sheet = pd.read_excel(path, sheet_name=None)
+    assert list(sheet) == ['Sheet1']
+    pd.testing.assert_frame_equal(sheet['Sheet1'], FRAME, check_dtype=False)
+
+def test_xlsx_sink_splits_by_city_case_insensitively(tmp_path):
+    path = str(tmp_path / 'out.xlsx')
+    sink = XlsxSink(path, split_by='city')
+    sink.write(FRAME.assign(city=['Sofia', 'sofia']))
+    sink.write(FRAME.assign(city='Varna'))
+    sink.close()
+    sheets = pd.read_excel(path, sheet_name=None)
+    assert list(sheets) == ['Sofia', 'sofia_', 'Varna']
+    assert [len(sheet) for sheet in sheets.values()] == [1, 1, 2]
+
+def test_xlsx_sink_rolls_over_at_the_row_limit(tmp_path):
+    path = str(tmp_path / 'out.xlsx')
+    sink = XlsxSink(path)
+    # Header plus two data rows per sheet
+    sink.MAX_ROWS = 3
+    for _ in range(3):
+        sink.write(FRAME)
+    sink.close()
+    sheets = pd.read_excel(path, sheet_name=None)
+    assert list(sheets) == ['Sheet1', 'Sheet1 (2)', 'Sheet1 (3)']
+    assert all(len(sheet) == 2 for sheet in sheets.values())
+
+def test_single_url_split_by_city(cli, stub):
+    cli('-l', page_url(stub, DATES[0]), '--city', 'sofia', '--split-sheets', 'city', '--store', 'store', '-o', 'single')
+    sheets = pd.read_excel('2023-02-01 - single.xlsx', sheet_name=None)
+    assert list(sheets) == ['sofia']
+    assert set(sheets['sofia']['type']) == {'sales', 'rent'}
+    assert set(sheets['sofia']['city']) == {'sofia'}
@@ -0,0 +1,75 @@
+import os
+import time
+
+import pytest
+
+from http_cache import ResponseCache, is_immutable, normalize_url
+from test_transport import FakeResponse
+
+CURRENT = 'http://imot.test/pcgi/imot.cgi?act=14'
+PAST = 'http://imot.test/pcgi/imot.cgi?act=14&date=01.02.2023'
+
+class Origin:
+    # Answers 304 when the client's validator matches the current ETag
+    def __init__(self, body=b'page', etag='"v1"'):
+        self.body = body
+        self.etag = etag
+        self.requests = []
+
+    def __call__(self, url, headers=None):
+        self.requests.append(headers or {})
+        if self.etag and (headers or {}).get('If-None-Match') == self.etag:
+            return FakeResponse(304)
+        return FakeResponse(200, self.body, {'ETag': self.etag, 'Last-Modified': 'Wed, 01 Feb 2023 00:00:00 GMT'})
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path / 'cache'))
+
+def test_normalize_url():
+    assert normalize_url('HTTP://Imot.test?b=2&a=1#top') == 'http://imot.test/?a=1&b=2'
+
+def test_is_immutable():
+    assert is_immutable(PAST)
+    assert not is_immutable(CURRENT)
+    assert not is_immutable(time.strftime('http://imot.test/x?a=1&date=%d.%m.%Y'))
+
+def test_current_pages_are_revalidated(cache):
+    origin = Origin()
+    assert cache.fetch(CURRENT, origin) == b'page'
+    assert cache.fetch(CURRENT, origin) == b'page'
+    assert origin.requests[1] == {'If-None-Match': '"v1"', 'If-Modified-Since': 'Wed, 01 Feb 2023 00:00:00 GMT'}
+
+    origin.etag, origin.body = '"v2"', b'new page'
+    assert cache.fetch(CURRENT, origin) == b'new page'
+    assert cache.fetch(CURRENT, origin) == b'new page'
+    assert len(origin.requests) == 4
+
+def test_past_dated_pages_are_served_without_a_request(cache):
+    origin = Origin()
+    cache.fetch(PAST, origin)
+    assert cache.fetch(PAST.replace('act=14', 'act=14&'), origin) == b'page'
+    assert len(origin.requests) == 1
+
+def test_truncated_entries_are_refetched(cache):
+    origin = Origin()
+    cache.fetch(PAST, origin)
+    path = cache.path_for(PAST)
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 1)
+    assert cache.fetch(PAST, origin) == b'page'
+    assert len(origin.requests) == 2
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache'), max_bytes=2500)
+    origin = Origin(body=b'x' * 800)
+    urls = [f'{PAST}&pn={i}' for i in range(3)]
+    for i, url in enumerate(urls[:2]):
+        cache.fetch(url, origin)
+        os.utime(cache.path_for(url), (1000 + i, 1000 + i))
+    # Reading the first entry makes the second one the least recently used
+    cache.fetch(urls[0], origin)
+    cache.fetch(urls[2], origin)
+    assert os.path.exists(cache.path_for(urls[0]))
+    assert not os.path.exists(cache.path_for(urls[1]))
+    assert cache.disk_usage() <= 2500
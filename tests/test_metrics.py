@@ -0,0 +1,42 @@
+import re
+
+import metrics
+from metrics import Metrics
+
+def test_metrics_endpoint(monkeypatch):
+    import app
+    from result_cache import ResultCache
+
+    monkeypatch.setattr(app, 'result_cache', ResultCache())
+    app.result_cache.put('http://imot.test/x', 'report', 10)
+    app.result_cache.get('http://imot.test/x')
+    app.result_cache.get('http://imot.test/y')
+    for seconds in (0.002, 0.02, 60):
+        metrics.observe('imot_stage_seconds', seconds, stage='test_stage')
+    metrics.inc('imot_http_requests_total', status=418)
+
+    body = app.app.test_client().get('/metrics').get_data(as_text=True)
+    assert '# TYPE imot_stage_seconds histogram' in body
+    assert '# TYPE imot_http_requests_total counter' in body
+    assert re.search(r'^imot_http_requests_total\{status="418"\} [1-9]', body, re.M)
+    buckets = [int(count) for count in re.findall(r'^imot_stage_seconds_bucket\{stage="test_stage",le="[^"]+"\} (\d+)$', body, re.M)]
+    assert buckets == sorted(buckets)
+    assert body.count('imot_stage_seconds_bucket{stage="test_stage",le="+Inf"} 3\n') == 1
+    assert 'imot_stage_seconds_count{stage="test_stage"} 3\n' in body
+    assert '# TYPE imot_result_cache_hits_total counter' in body
+    assert 'imot_result_cache_hits_total 1\n' in body
+    assert 'imot_result_cache_misses_total 1\n' in body
+    assert 'imot_result_cache_bytes 10\n' in body
+
+def test_merge_adds_a_worker_delta():
+    parent, worker = Metrics(), Metrics()
+    parent.inc('imot_rows_total', 5)
+    before = worker.snapshot()
+    worker.inc('imot_rows_total', 60)
+    with worker.timer('parse'):
+        pass
+    parent.merge(worker.since(before))
+    summary = parent.summary()
+    assert summary['counters'] == {'imot_rows_total': 65}
+    assert summary['stages']['parse']['count'] == 1
+    assert parent.render().count('imot_stage_seconds_count{stage="parse"} 1') == 1
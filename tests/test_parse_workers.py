@@ -0,0 +1,21 @@
+import pandas as pd
+
+from fixtures import synthetic_page
+from pipeline import Pipeline, frame_from_columns, process_chunk
+
+def test_process_chunk_matches_in_process_parsing():
+    pipeline = Pipeline(label='Bed')
+    items = [(synthetic_page(seed), f'x?a=1&date=0{seed}.02.2023', 'sales') for seed in range(1, 4)]
+    items.append((b'<html><body>no table</body></html>', 'x?a=1&date=04.02.2023', 'sales'))
+    columns_list, worker_metrics = process_chunk(pipeline, items)
+    for (content, url, type), columns in zip(items[:3], columns_list):
+        expected = pipeline.process_content(content, url, type)
+        pd.testing.assert_frame_equal(frame_from_columns(columns), expected.reset_index(drop=True))
+        assert frame_from_columns(columns).attrs == expected.attrs
+    assert columns_list[3] is None
+    assert {name for name, _ in worker_metrics['histograms']} == {'imot_stage_seconds'}
+
+def test_parse_workers_produce_the_same_workbook(cli, manifest):
+    cli('-m', manifest, '-o', 'threads', '--parse-workers', '0')
+    cli('-m', manifest, '-o', 'workers', '--parse-workers', '2', '--chunk-size', '2')
+    pd.testing.assert_frame_equal(pd.read_excel('threads.xlsx'), pd.read_excel('workers.xlsx'))
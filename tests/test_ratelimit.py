@@ -0,0 +1,138 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+import transport
+from ratelimit import BACKGROUND, INTERACTIVE, HostLimiter, Scheduler, lane
+
+def limiter(**options):
+    settings = dict(rate=0, burst=1, concurrency=1, max_concurrency=8, latency_factor=3.0, cooldown=0.0)
+    settings.update(options)
+    return HostLimiter(**settings)
+
+@pytest.fixture
+def patient_retries(monkeypatch):
+    monkeypatch.setattr(transport, 'settings', dict(transport.settings))
+    transport.configure(retries=8, backoff=0.05, backoff_max=0.5)
+    yield
+    transport.configure()
+
+def hammer(stub, scheduler, count=60, threads=16):
+    # Number of requests that ran out of retries
+    def fetch(i):
+        try:
+            transport.fetch(f'{stub.url}/stats?date=01.01.2024&i={i}')
+        except requests.HTTPError:
+            return 1
+        return 0
+
+    transport.set_scheduler(scheduler)
+    try:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            return sum(pool.map(fetch, range(count)))
+    finally:
+        transport.set_scheduler(None)
+
+def test_adaptive_window_avoids_429s(stub, patient_retries):
+    stub.latency = 0.02
+    stub.max_inflight = 3
+    stub.retry_after = 0.05
+    # Unthrottled, a request can occasionally exhaust its retries
+    hammer(stub, None)
+    unlimited = stub.throttled
+    scheduler = Scheduler(rate=0, concurrency=8, max_concurrency=8, cooldown=0.05)
+    hammer(stub, scheduler)
+    assert stub.throttled - unlimited < unlimited / 2
+    assert next(iter(scheduler.stats().values()))['limit'] < 8
+
+def test_window_halves_on_429_and_grows_when_healthy():
+    host = limiter(concurrency=8)
+    host.acquire()
+    host.release(429)
+    assert host.limit == 4
+    for _ in range(4):
+        host.acquire()
+        host.release(200)
+    assert 4.9 < host.limit < 5
+
+def test_retry_after_pauses_the_host():
+    host = limiter()
+    host.acquire()
+    host.release(429, retry_after=0.2)
+    start = time.monotonic()
+    host.acquire()
+    assert time.monotonic() - start >= 0.18
+
+def test_interactive_waiters_go_first():
+    host = limiter(rate=20, burst=1)
+    host.acquire()
+    order = []
+
+    def request(name, priority):
+        host.acquire(priority)
+        order.append(name)
+        host.release(200)
+
+    threads = [threading.Thread(target=request, args=(f'background {i}', BACKGROUND)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.01)
+    with lane(INTERACTIVE):
+        threads.append(threading.Thread(target=request, args=('interactive', INTERACTIVE)))
+        threads[-1].start()
+    host.release(200)
+    for thread in threads:
+        thread.join()
+    assert order[0] == 'interactive'
+
+def test_shared_file_caps_the_combined_rate(tmp_path):
+    # Two schedulers on one file stand in for two processes, e.g. a CLI backfill and the app
+    path = str(tmp_path / 'rate.db')
+    schedulers = [Scheduler(rate=50, burst=2, max_concurrency=8, shared_path=path) for _ in range(2)]
+
+    def request(i):
+        with schedulers[i % 2].slot('http://imot.test/x') as slot:
+            slot.record(200)
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(request, range(40)))
+    # The background lane keeps one token in reserve
+    assert time.monotonic() - start >= (40 - 1) / 50 * 0.9
+
+def test_shared_file_lets_interactive_requests_skip_the_backfill(tmp_path):
+    path = str(tmp_path / 'rate.db')
+    backfill = Scheduler(rate=10, burst=2, max_concurrency=8, shared_path=path)
+    app = Scheduler(rate=10, burst=2, max_concurrency=8, shared_path=path)
+    stop = threading.Event()
+
+    def background():
+        while not stop.is_set():
+            with backfill.slot('http://imot.test/x', BACKGROUND) as slot:
+                slot.record(200)
+
+    thread = threading.Thread(target=background)
+    thread.start()
+    try:
+        time.sleep(0.5)
+        start = time.monotonic()
+        with app.slot('http://imot.test/x', INTERACTIVE) as slot:
+            slot.record(200)
+        waited = time.monotonic() - start
+    finally:
+        stop.set()
+        thread.join()
+    assert waited < 0.05
+
+def test_shared_file_spreads_retry_after(tmp_path):
+    path = str(tmp_path / 'rate.db')
+    first, second = (Scheduler(rate=100, shared_path=path) for _ in range(2))
+    with first.slot('http://imot.test/x') as slot:
+        slot.record(429, retry_after=0.3)
+    start = time.monotonic()
+    with second.slot('http://imot.test/x') as slot:
+        slot.record(200)
+    assert time.monotonic() - start >= 0.25
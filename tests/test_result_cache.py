@@ -0,0 +1,72 @@
+import time
+
+from result_cache import ResultCache
+
+CURRENT = 'http://imot.test/pcgi/imot.cgi?act=14'
+PAST = 'http://imot.test/pcgi/imot.cgi?act=14&date=01.02.2023'
+
+def test_current_pages_expire_after_the_ttl(monkeypatch):
+    cache = ResultCache(ttl=60)
+    cache.put(CURRENT, 'report', 10)
+    cache.put(PAST, 'old report', 10)
+    assert cache.get(CURRENT) == 'report'
+    later = time.time() + 61
+    monkeypatch.setattr(time, 'time', lambda: later)
+    assert cache.get(CURRENT) is None
+    assert cache.get(PAST) == 'old report'
+    assert cache.stats()['entries'] == 1
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ResultCache(max_bytes=25)
+    for i in range(2):
+        cache.put(f'{PAST}&pn={i}', i, 10)
+    cache.get(f'{PAST}&pn=0')
+    cache.put(f'{PAST}&pn=2', 2, 10)
+    assert cache.get(f'{PAST}&pn=1') is None
+    assert cache.get(f'{PAST}&pn=0') == 0
+    stats = cache.stats()
+    assert (stats['evictions'], stats['entries'], stats['bytes']) == (1, 2, 20)
+
+def test_keys_are_normalised():
+    cache = ResultCache()
+    cache.put(PAST, 'report', 1)
+    assert cache.get(PAST.replace('act=14&date=01.02.2023', 'date=01.02.2023&act=14')) == 'report'
+    assert cache.stats()['hit_rate'] == 1.0
+
+def test_entries_survive_a_restart(tmp_path):
+    ResultCache(directory=str(tmp_path)).put(PAST, {'rows': 60}, 10)
+    restarted = ResultCache(directory=str(tmp_path))
+    assert restarted.get(PAST) == {'rows': 60}
+    assert restarted.get(CURRENT) is None
+
+def test_expired_files_are_deleted_on_read(monkeypatch, tmp_path):
+    ResultCache(ttl=60, directory=str(tmp_path)).put(CURRENT, 'report', 10)
+    later = time.time() + 61
+    monkeypatch.setattr(time, 'time', lambda: later)
+    assert ResultCache(ttl=60, directory=str(tmp_path)).get(CURRENT) is None
+    assert list(tmp_path.glob('*.pickle')) == []
+
+def test_directory_is_capped_least_recently_used_first(tmp_path):
+    cache = ResultCache(directory=str(tmp_path), max_disk_bytes=10000)
+    for i in range(10):
+        cache.put(f'{PAST}&pn={i}', b'x' * 2000, 2000)
+    assert cache.disk_usage() <= 10000
+    restarted = ResultCache(directory=str(tmp_path))
+    assert restarted.get(f'{PAST}&pn=9') == b'x' * 2000
+    assert restarted.get(f'{PAST}&pn=0') is None
+
+def test_app_serves_repeated_reports_from_the_cache(monkeypatch, stub):
+    import app
+    import transport
+    from conftest import DATES, page_url
+    from jobs import JobQueue
+
+    monkeypatch.setattr(transport, 'scheduler', None)
+    monkeypatch.setattr(app, 'result_cache', ResultCache())
+    monkeypatch.setattr(app, 'job_queue', JobQueue(max_workers=1))
+    url = page_url(stub, DATES[0])
+    first = app.process_data(url, 'sofia', False)
+    requests = stub.requests
+    assert app.process_data(url, 'varna', False) == ('2023-02-01 - varna.xlsx', first[1])
+    assert stub.requests == requests
+    assert app.app.test_client().get('/cache/stats').json['hits'] == 1
@@ -0,0 +1,37 @@
+import pandas as pd
+
+from storage import append_snapshot, load_snapshots
+
+def snapshot(report_date, type, price):
+    return pd.DataFrame({'Region': ['A', 'B'], '1_Bed_Price': [price, price + 1], 'report_date': report_date, 'type': type})
+
+def test_snapshots_round_trip_with_filters(tmp_path):
+    root = str(tmp_path / 'store')
+    append_snapshot(snapshot('2023-02-01', 'sales', 100.0), root, 'sofia')
+    append_snapshot(snapshot('2023-02-01', 'rent', 1.0), root, 'sofia')
+    append_snapshot(snapshot('2023-03-01', 'sales', 200.0), root, 'varna')
+    assert len(load_snapshots(root)) == 6
+    sofia = load_snapshots(root, cities=['sofia'], types=['sales'])
+    assert list(sofia['1_Bed_Price']) == [100.0, 101.0]
+    assert set(load_snapshots(root, date_from='2023-02-15')['city']) == {'varna'}
+
+def test_restoring_a_snapshot_replaces_it(tmp_path):
+    root = str(tmp_path / 'store')
+    append_snapshot(snapshot('2023-02-01', 'sales', 100.0), root, 'sofia')
+    append_snapshot(snapshot('2023-02-01', 'sales', 150.0), root, 'sofia')
+    assert list(load_snapshots(root)['1_Bed_Price']) == [150.0, 151.0]
+
+def test_current_pages_are_stored_under_today(tmp_path):
+    root = str(tmp_path / 'store')
+    append_snapshot(snapshot(None, 'sales', 100.0), root, 'sofia')
+    assert set(load_snapshots(root)['report_date']) == {pd.Timestamp.today().strftime('%Y-%m-%d')}
+
+def test_region_counts_can_differ_between_dates(tmp_path):
+    # 60 regions fit int8 category codes, 300 need int16
+    root = str(tmp_path / 'store')
+    for report_date, count in [('2023-02-01', 60), ('2023-03-01', 300)]:
+        regions = [f'Region {i}' for i in range(count)]
+        append_snapshot(pd.DataFrame({'Region': regions, '1_Bed_Price': 1.0, 'report_date': report_date, 'type': 'sales'}), root, 'sofia')
+    stored = load_snapshots(root)
+    assert len(stored) == 360
+    assert stored['Region'].iloc[-1] == 'Region 299'
@@ -0,0 +1,20 @@
+import pytest
+
+from fixtures import synthetic_page
+from pipeline import Pipeline, parse_page_bs4
+
+PAGE = synthetic_page().decode('utf-8')
+NO_META = PAGE.replace('<meta charset="utf-8">', '')
+
+@pytest.mark.parametrize('content', [
+    PAGE.encode('utf-8'),
+    NO_META.encode('utf-8'),
+    NO_META.encode('windows-1251'),
+    PAGE.replace('utf-8', 'windows-1251').encode('windows-1251'),
+], ids=['utf-8', 'utf-8 without meta', 'windows-1251 without meta', 'windows-1251'])
+def test_fast_parser_matches_bs4(content):
+    fast = Pipeline().process_content(content, 'x')
+    legacy = Pipeline(parse=parse_page_bs4).process_content(content, 'x')
+    assert len(fast) == 60
+    assert fast['Region'].iloc[0] == 'Район 0'
+    assert fast.equals(legacy)
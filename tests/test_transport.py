@@ -0,0 +1,86 @@
+import time
+
+import pytest
+import requests
+
+import transport
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(transport, 'settings', dict(transport.settings))
+    monkeypatch.setattr(transport, 'scheduler', None)
+    monkeypatch.setattr(transport, 'cache', None)
+    transport.configure(retries=3, backoff=0.01, backoff_max=0.5)
+    yield
+    transport.configure()
+
+class FakeResponse:
+    def __init__(self, status_code, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(self.status_code)
+
+    def close(self):
+        pass
+
+def script(monkeypatch, *outcomes):
+    calls = []
+
+    class Session:
+        def get(self, url, **kwargs):
+            calls.append(kwargs)
+            outcome = outcomes[len(calls) - 1]
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+    monkeypatch.setattr(transport, 'get_session', Session)
+    return calls
+
+def test_retries_until_success(monkeypatch):
+    calls = script(monkeypatch, requests.ConnectionError(), FakeResponse(503), FakeResponse(200, b'page'))
+    assert transport.fetch('http://imot.test/x') == b'page'
+    assert len(calls) == 3
+    assert calls[0]['timeout'] == (transport.settings['connect_timeout'], transport.settings['read_timeout'])
+
+def test_client_errors_are_not_retried(monkeypatch):
+    calls = script(monkeypatch, FakeResponse(404))
+    with pytest.raises(requests.HTTPError):
+        transport.fetch('http://imot.test/x')
+    assert len(calls) == 1
+
+def test_connection_errors_raise_after_the_last_retry(monkeypatch):
+    calls = script(monkeypatch, *[requests.Timeout()] * 4)
+    with pytest.raises(requests.Timeout):
+        transport.fetch('http://imot.test/x')
+    assert len(calls) == 4
+
+def test_retry_after_seconds_and_dates():
+    assert transport.retry_after_seconds(FakeResponse(429, headers={'Retry-After': '2'})) == 2
+    assert transport.retry_after_seconds(FakeResponse(429, headers={'Retry-After': 'soon'})) is None
+    assert transport.retry_after_seconds(FakeResponse(429)) is None
+    later = time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime(time.time() + 60))
+    assert 55 < transport.retry_after_seconds(FakeResponse(429, headers={'Retry-After': later})) <= 60
+
+def test_gives_up_on_a_failing_stub(stub):
+    stub.error_rate = 1.0
+    with pytest.raises(requests.HTTPError):
+        transport.fetch(f'{stub.url}/x')
+    assert stub.requests == 4
+
+def test_honours_retry_after_from_the_stub(stub):
+    stub.throttle_rate = 1.0
+    stub.retry_after = 0.1
+    start = time.monotonic()
+    response = transport.get(f'{stub.url}/x')
+    assert response.status_code == 429
+    assert stub.requests == 4
+    assert time.monotonic() - start >= 0.3
+
+def test_configure_rejects_unknown_settings():
+    with pytest.raises(TypeError):
+        transport.configure(pool=4)
@@ -0,0 +1,112 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+settings = {
+    'pool_size': 16,
+    'connect_timeout': 5.0,
+    'read_timeout': 30.0,
+    'retries': 4,
+    'backoff': 0.5,
+    'backoff_max': 30.0,
+}
+
+_session = None
+_session_lock = threading.Lock()
+cache = None
+scheduler = None
+
+def configure(**options):
+    global _session
+    unknown = set(options) - set(settings)
+    if unknown:
+        raise TypeError(f"Unknown transport settings: {', '.join(sorted(unknown))}")
+    with _session_lock:
+        settings.update(options)
+        # Rebuild the pool on next use so the new size takes effect
+        if _session is not None:
+            _session.close()
+            _session = None
+
+def set_cache(response_cache):
+    global cache
+    cache = response_cache
+
+def set_scheduler(request_scheduler):
+    global scheduler
+    scheduler = request_scheduler
+
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=settings['pool_size'], pool_maxsize=settings['pool_size'])
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+def retry_after_seconds(response):
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+def backoff_delay(attempt):
+    # Full jitter: a random wait up to the capped exponential backoff
+    return random.uniform(0, min(settings['backoff_max'], settings['backoff'] * 2 ** attempt))
+
+def get(url, **kwargs):
+    session = get_session()
+    kwargs.setdefault('timeout', (settings['connect_timeout'], settings['read_timeout']))
+    attempt = 0
+    while True:
+        try:
+            if scheduler is None:
+                response = session.get(url, **kwargs)
+            else:
+                # Every attempt, retries included, waits for its host's rate and concurrency window
+                with scheduler.slot(url) as slot:
+                    response = session.get(url, **kwargs)
+                    slot.record(response.status_code, retry_after_seconds(response) if response.status_code == 429 else None)
+        except (requests.ConnectionError, requests.Timeout):
+            metrics.inc('imot_http_errors_total')
+            if attempt >= settings['retries']:
+                raise
+            time.sleep(backoff_delay(attempt))
+            attempt += 1
+            continue
+        metrics.inc('imot_http_requests_total', status=response.status_code)
+        if response.status_code not in RETRY_STATUSES or attempt >= settings['retries']:
+            metrics.inc('imot_downloaded_bytes_total', len(response.content))
+            return response
+        delay = retry_after_seconds(response)
+        if delay is None:
+            delay = backoff_delay(attempt)
+        response.close()
+        time.sleep(min(delay, settings['backoff_max']))
+        attempt += 1
+
+def fetch(url):
+    if cache is not None:
+        return cache.fetch(url, get)
+    response = get(url)
+    response.raise_for_status()
+    return response.content